@@ -0,0 +1,298 @@
+from asyncio import new_event_loop
+from collections.abc import Callable
+from itertools import count
+from json import loads
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from harness import Measurement, measure
+from mcp.tools import register
+from payloads import edited_payload, scaled_payload
+from renderers import docx
+from renderers.plan import compile_plan
+from services import WorkspaceService
+from storage import workspace
+from storage.online.blob_storage import OnlineStorage
+from storage.online.fault_injection import FaultInjectingStorage
+from storage.online.local_storage import LocalOnlineStorage
+
+USER_ID = "bench"
+
+
+class BenchConfig(NamedTuple):
+    sections: int
+    items: int
+    bullets: int
+    iterations: int
+    warmup: int
+    latency: float
+
+
+Case = Callable[[BenchConfig, Path], Measurement]
+
+CASES: dict[str, Case] = {}
+
+
+def case(name: str) -> Callable[[Case], Case]:
+    def decorator(fn: Case) -> Case:
+        CASES[name] = fn
+        return fn
+
+    return decorator
+
+
+def _payload(config: BenchConfig, seed: int = 0):
+    return scaled_payload(config.sections, config.items, config.bullets, seed=seed)
+
+
+def _backend(config: BenchConfig, workdir: Path) -> OnlineStorage:
+    backend: OnlineStorage = LocalOnlineStorage(workdir / "online")
+
+    if config.latency:
+        backend = FaultInjectingStorage(backend, latency=config.latency)
+
+    return backend
+
+
+def _measure(config: BenchConfig, operation, setup=None) -> Measurement:
+    return measure(operation, config.iterations, config.warmup, setup)
+
+
+@case("compile_plan")
+def bench_compile_plan(config: BenchConfig, workdir: Path) -> Measurement:
+    payload = _payload(config)
+
+    return _measure(config, lambda: compile_plan(payload))
+
+
+@case("create_document")
+def bench_create_document(config: BenchConfig, workdir: Path) -> Measurement:
+    path = workdir / "resume.docx"
+
+    return _measure(config, lambda: docx.create_document(path))
+
+
+@case("render")
+def bench_render(config: BenchConfig, workdir: Path) -> Measurement:
+    path = workdir / "resume.docx"
+    payload = _payload(config)
+
+    return _measure(
+        config,
+        lambda: docx.render(path, payload),
+        setup=lambda: docx.create_document(path),
+    )
+
+
+@case("render_incremental")
+def bench_render_incremental(config: BenchConfig, workdir: Path) -> Measurement:
+    payload = _payload(config)
+    source = docx._template_pool.template_bytes()
+    previous = docx.render_incremental(source, payload)
+    revisions = count(1)
+    edited: list[Any] = []
+
+    def setup() -> None:
+        edited[:] = [edited_payload(payload, next(revisions))]
+
+    return _measure(
+        config,
+        lambda: docx.render_incremental(previous.data, edited[0], previous.anchors),
+        setup=setup,
+    )
+
+
+@case("get_artifact")
+def bench_get_artifact(config: BenchConfig, workdir: Path) -> Measurement:
+    workspace.online_storage = _backend(config, workdir)
+    workspace_dir = workspace.create_workspace(workdir)
+    process_id = "download"
+
+    workspace.create_artifact(workspace_dir, USER_ID, process_id)
+    path = workspace.artifact_path(workspace_dir, USER_ID, process_id)
+    docx.create_document(path)
+    docx.render(path, _payload(config))
+    workspace.save_artifact(workspace_dir, USER_ID, process_id)
+
+    return _measure(
+        config,
+        lambda: workspace.get_artifact(workspace_dir, USER_ID, process_id),
+        setup=lambda: workspace.delete_artifact(workspace_dir, USER_ID, process_id),
+    )
+
+
+@case("save_artifact")
+def bench_save_artifact(config: BenchConfig, workdir: Path) -> Measurement:
+    workspace.online_storage = _backend(config, workdir)
+    workspace_dir = workspace.create_workspace(workdir)
+    process_id = "upload"
+
+    workspace.create_artifact(workspace_dir, USER_ID, process_id)
+    path = workspace.artifact_path(workspace_dir, USER_ID, process_id)
+    docx.create_document(path)
+    docx.render(path, _payload(config))
+
+    return _measure(
+        config, lambda: workspace.save_artifact(workspace_dir, USER_ID, process_id)
+    )
+
+
+class _ToolRegistry:
+    def __init__(self) -> None:
+        self.tools: dict[str, Callable[..., Any]] = {}
+
+    def tool(self, name: str, **_: Any) -> Callable[[Callable], Callable]:
+        def decorator(fn: Callable) -> Callable:
+            self.tools[name] = fn
+            return fn
+
+        return decorator
+
+
+class _App:
+    def __init__(self) -> None:
+        self.mcp = _ToolRegistry()
+
+    def shutdown_handler(self, handler: Callable[[], None]) -> None:
+        pass
+
+
+def _tools(config: BenchConfig, workdir: Path) -> dict[str, Callable[..., Any]]:
+    """Register the tools and return them as blocking callables."""
+    # The service is a singleton, so the instance built here is the one the
+    # tools pick up, backed by the local fake instead of the default backend.
+    WorkspaceService(
+        root_parent=str(workdir),
+        write_behind=True,
+        online_storage=_backend(config, workdir),
+    )
+    app = _App()
+    register(app)
+    loop = new_event_loop()
+
+    def blocking(tool: Callable[..., Any]) -> Callable[..., Any]:
+        return lambda *args: loop.run_until_complete(tool(*args))
+
+    return {name: blocking(tool) for name, tool in app.mcp.tools.items()}
+
+
+def _new_render_id(tools: dict[str, Callable[..., Any]]) -> str:
+    return loads(tools["initialize_resume"](USER_ID))["render_id"]
+
+
+@case("mcp_initialize_resume")
+def bench_mcp_initialize_resume(config: BenchConfig, workdir: Path) -> Measurement:
+    tools = _tools(config, workdir)
+
+    return _measure(config, lambda: tools["initialize_resume"](USER_ID))
+
+
+@case("mcp_render_resume")
+def bench_mcp_render_resume(config: BenchConfig, workdir: Path) -> Measurement:
+    """First render of a new payload into a freshly initialized resume."""
+    tools = _tools(config, workdir)
+    seeds = count()
+    job: list[Any] = []
+
+    def setup() -> None:
+        job[:] = [_new_render_id(tools), _payload(config, seed=next(seeds) * 1000)]
+
+    return _measure(
+        config,
+        lambda: tools["render_resume"](USER_ID, job[0], job[1]),
+        setup=setup,
+    )
+
+
+@case("mcp_render_resume_edit")
+def bench_mcp_render_resume_edit(config: BenchConfig, workdir: Path) -> Measurement:
+    """Re-render after editing one section of the previous payload."""
+    tools = _tools(config, workdir)
+    render_id = _new_render_id(tools)
+    payload = _payload(config)
+    tools["render_resume"](USER_ID, render_id, payload)
+    revisions = count(1)
+    edited: list[Any] = []
+
+    def setup() -> None:
+        edited[:] = [edited_payload(payload, next(revisions))]
+
+    return _measure(
+        config,
+        lambda: tools["render_resume"](USER_ID, render_id, edited[0]),
+        setup=setup,
+    )
+
+
+@case("mcp_patch_resume")
+def bench_mcp_patch_resume(config: BenchConfig, workdir: Path) -> Measurement:
+    """Apply the same one-field edit as `mcp_render_resume_edit` as a patch."""
+    tools = _tools(config, workdir)
+    render_id = _new_render_id(tools)
+    payload = _payload(config)
+    tools["render_resume"](USER_ID, render_id, payload)
+    revisions = count(1)
+    patch: list[Any] = []
+
+    def setup() -> None:
+        revision = next(revisions)
+        item = edited_payload(payload, revision)["content"]["sections"][0]["items"][0]
+        patch[:] = [
+            {
+                "op": "replace",
+                "path": "/content/sections/0/items/0/content",
+                "value": item["content"],
+            }
+        ]
+
+    return _measure(
+        config,
+        lambda: tools["patch_resume"](USER_ID, render_id, patch),
+        setup=setup,
+    )
+
+
+@case("mcp_patch_resume_evicted")
+def bench_mcp_patch_resume_evicted(config: BenchConfig, workdir: Path) -> Measurement:
+    """Patch a resume whose local copy was swept, so its payload is downloaded."""
+    tools = _tools(config, workdir)
+    service = WorkspaceService(root_parent=str(workdir))
+    render_id = _new_render_id(tools)
+    payload = _payload(config)
+    tools["render_resume"](USER_ID, render_id, payload)
+    revisions = count(1)
+    patch: list[Any] = []
+
+    def setup() -> None:
+        # Deleted like the sweeper does, once the uploads have landed.
+        service.flush_uploads()
+        workspace.delete_artifact(service.workspace_dir, USER_ID, render_id)
+        service.manifest.remove(USER_ID, render_id)
+        patch[:] = [
+            {
+                "op": "replace",
+                "path": "/content/summary",
+                "value": f"Revision {next(revisions)}",
+            }
+        ]
+
+    def operation() -> None:
+        result = tools["patch_resume"](USER_ID, render_id, patch)
+
+        if not result["ok"]:
+            raise RuntimeError(f"Patch after eviction failed: {result['message']}")
+
+    return _measure(config, operation, setup=setup)
+
+
+@case("mcp_render_resume_unchanged")
+def bench_mcp_render_resume_unchanged(
+    config: BenchConfig, workdir: Path
+) -> Measurement:
+    """Re-render of a payload identical to the previous render."""
+    tools = _tools(config, workdir)
+    render_id = _new_render_id(tools)
+    payload = _payload(config)
+    tools["render_resume"](USER_ID, render_id, payload)
+
+    return _measure(config, lambda: tools["render_resume"](USER_ID, render_id, payload))
@@ -0,0 +1,102 @@
+from collections.abc import Callable
+from gc import collect, disable, enable, isenabled
+from resource import RUSAGE_SELF, getrusage
+from sys import platform
+from time import perf_counter
+from typing import TypedDict
+
+
+class Measurement(TypedDict):
+    iterations: int
+    throughput: float
+    mean_ms: float
+    min_ms: float
+    p50_ms: float
+    p90_ms: float
+    p99_ms: float
+    max_ms: float
+    peak_rss_mb: float
+
+
+def peak_rss_mb() -> float:
+    """Return the peak resident set size of this process in MiB."""
+    peak = getrusage(RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is reported in bytes on macOS and in KiB elsewhere.
+    return peak / (1024 * 1024) if platform == "darwin" else peak / 1024
+
+
+def percentile(sorted_samples: list[float], fraction: float) -> float:
+    if not sorted_samples:
+        return 0.0
+
+    position = (len(sorted_samples) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_samples) - 1)
+
+    return sorted_samples[lower] + (sorted_samples[upper] - sorted_samples[lower]) * (
+        position - lower
+    )
+
+
+def measure(
+    operation: Callable[[], object],
+    iterations: int,
+    warmup: int = 3,
+    setup: Callable[[], object] | None = None,
+) -> Measurement:
+    """Time `operation` over a number of iterations.
+
+    `setup` runs before every iteration, including warmup, and is not
+    timed. Garbage collection is paused while an iteration is timed so
+    that collections do not land on arbitrary samples.
+
+    Args:
+        operation (Callable[[], object]): The operation to time.
+        iterations (int): The number of timed iterations.
+        warmup (int): The number of untimed iterations run first.
+        setup (Callable[[], object] | None): Untimed per-iteration setup.
+    Returns:
+        Measurement: Throughput, latency percentiles and peak RSS.
+    """
+    if iterations < 1:
+        raise ValueError("At least one iteration is required.")
+
+    for _ in range(warmup):
+        if setup is not None:
+            setup()
+        operation()
+
+    samples: list[float] = []
+    gc_was_enabled = isenabled()
+
+    for _ in range(iterations):
+        if setup is not None:
+            setup()
+
+        collect()
+        disable()
+
+        try:
+            start = perf_counter()
+            operation()
+            samples.append(perf_counter() - start)
+
+        finally:
+            if gc_was_enabled:
+                enable()
+
+    samples.sort()
+    total = sum(samples)
+
+    return {
+        "iterations": iterations,
+        "throughput": iterations / total if total else 0.0,
+        "mean_ms": total / iterations * 1000,
+        "min_ms": samples[0] * 1000,
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p90_ms": percentile(samples, 0.90) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+        "max_ms": samples[-1] * 1000,
+        "peak_rss_mb": peak_rss_mb(),
+    }
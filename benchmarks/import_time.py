@@ -0,0 +1,101 @@
+"""Check that importing the server stays within an import-time budget.
+
+Each module is imported in a fresh interpreter and timed. The check fails if
+the import takes longer than the budget, or if importing the module pulls
+in a module that should only load on first use.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --budget-ms 80 --modules app services
+"""
+
+from argparse import ArgumentParser
+from json import loads
+from pathlib import Path
+from statistics import median
+from subprocess import CalledProcessError, run
+from sys import executable, exit
+
+SOURCE_DIR = Path(__file__).resolve().parent.parent / "src" / "resume_assembler"
+
+DEFAULT_MODULES = ["app", "mcp.tools", "services"]
+DEFAULT_BUDGET_MS = 100.0
+
+# Heavy modules that must stay out of the import graph until first render.
+DEFERRED_MODULES = ["docx", "lxml", "renderers.docx"]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"ms": elapsed * 1000, "modules": sorted(sys.modules)}}))
+"""
+
+
+def import_time_ms(module: str) -> tuple[float, list[str]]:
+    """Import `module` in a fresh interpreter.
+
+    Returns:
+        tuple[float, list[str]]: The import time in milliseconds and the
+            names of every module loaded.
+    """
+    try:
+        completed = run(
+            [executable, "-c", _PROBE.format(module=module)],
+            capture_output=True,
+            text=True,
+            cwd=SOURCE_DIR,
+            check=True,
+        )
+
+    except CalledProcessError as e:
+        error = e.stderr.strip().splitlines()
+        raise RuntimeError(
+            f"Importing {module} failed: {error[-1] if error else ''}"
+        ) from e
+
+    result = loads(completed.stdout)
+
+    return result["ms"], result["modules"]
+
+
+def main() -> int:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="Imports per module; the median is compared with the budget.",
+    )
+    args = parser.parse_args()
+
+    failures = 0
+
+    for module in args.modules:
+        try:
+            runs = [import_time_ms(module) for _ in range(args.repeat)]
+
+        except RuntimeError as e:
+            print(f"{module:<20} ERROR {e}")
+            failures += 1
+            continue
+
+        elapsed = median(ms for ms, _ in runs)
+        loaded = set(runs[0][1])
+        eager = [name for name in DEFERRED_MODULES if name in loaded]
+        ok = elapsed <= args.budget_ms and not eager
+        failures += not ok
+
+        print(
+            f"{module:<20} {elapsed:>8.1f} ms  budget {args.budget_ms:.0f} ms  "
+            f"{'ok' if ok else 'FAIL'}"
+            + (f"  eagerly imports {', '.join(eager)}" if eager else "")
+        )
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,78 @@
+from copy import deepcopy
+from itertools import cycle
+from json import loads
+from re import sub
+from typing import Any
+
+from utils.payload import EXAMPLE_PAYLOAD, Payload
+
+
+def example_payload() -> Payload:
+    """Parse `EXAMPLE_PAYLOAD`, whose keys are unquoted, into a payload."""
+    quoted = sub(r"(?m)([{,]\s*)([A-Za-z_]\w*)\s*:", r'\1"\2":', EXAMPLE_PAYLOAD)
+    payload = loads(quoted)
+    payload["formatting"] = payload.pop("configurations", {})
+
+    return payload
+
+
+def scaled_payload(
+    sections: int = 4,
+    items: int = 2,
+    bullets: int = 3,
+    seed: int = 0,
+) -> Payload:
+    """Build a payload shaped like `EXAMPLE_PAYLOAD` at the requested size.
+
+    Sections, items and bullets are drawn in turn from the example and
+    numbered so every section hashes differently. `seed` is added to the
+    numbering, so payloads built with different seeds differ everywhere.
+
+    Args:
+        sections (int): The number of sections.
+        items (int): The number of items in each section.
+        bullets (int): The number of bullets in each item.
+        seed (int): Offset used to make otherwise identical payloads differ.
+    Returns:
+        Payload: The generated payload.
+    """
+    payload = example_payload()
+    example_sections = payload["content"]["sections"]
+    example_items = [item for section in example_sections for item in section["items"]]
+    example_bullets = [
+        bullet for item in example_items for bullet in item.get("bullets") or ()
+    ]
+
+    section_source = cycle(example_sections)
+    item_source = cycle(example_items)
+    bullet_source = cycle(example_bullets)
+
+    generated: list[dict[str, Any]] = []
+
+    for i in range(sections):
+        section = {"heading": f"{next(section_source)['heading']} {seed + i + 1}"}
+        section["items"] = []
+
+        for _ in range(items):
+            item = deepcopy(next(item_source))
+            item["bullets"] = [next(bullet_source) for _ in range(bullets)] or None
+            section["items"].append(item)
+
+        generated.append(section)
+
+    payload["content"]["sections"] = generated
+
+    return payload
+
+
+def edited_payload(payload: Payload, revision: int, section: int = 0) -> Payload:
+    """Return a copy of `payload` with one section's first item changed.
+
+    Each `revision` produces different content, so successive edits never
+    repeat an earlier render.
+    """
+    edited = deepcopy(payload)
+    item = edited["content"]["sections"][section]["items"][0]
+    item["content"] = f"{item.get('content') or ''} (revision {revision})"
+
+    return edited
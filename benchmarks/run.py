@@ -0,0 +1,223 @@
+"""Run the benchmark suite and compare it against saved baselines.
+
+Each case runs in its own interpreter, so peak RSS is measured per case and
+no case benefits from caches warmed by another.
+
+    python benchmarks/run.py
+    python benchmarks/run.py --sections 20 --save docx-1.2
+    python benchmarks/run.py --compare docx-1.2 --max-regression 10
+"""
+
+from argparse import ArgumentParser, Namespace
+from json import dumps, loads
+from os import chdir
+from pathlib import Path
+from platform import platform, python_version
+from subprocess import CalledProcessError, run
+from sys import executable, exit, path
+from tempfile import TemporaryDirectory
+from typing import Any
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+SOURCE_DIR = BENCHMARKS_DIR.parent / "src" / "resume_assembler"
+BASELINES_DIR = BENCHMARKS_DIR / "baselines"
+
+path.insert(0, str(SOURCE_DIR))
+
+from cases import CASES, BenchConfig
+
+# Metrics compared against a baseline, and whether a larger value is better.
+COMPARED_METRICS = {
+    "throughput": True,
+    "p50_ms": False,
+    "p99_ms": False,
+    "peak_rss_mb": False,
+}
+
+
+def _parse_args() -> Namespace:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sections", type=int, default=4)
+    parser.add_argument("--items", type=int, default=2)
+    parser.add_argument("--bullets", type=int, default=3)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Seconds of latency added to every online storage call.",
+    )
+    parser.add_argument(
+        "--cases",
+        nargs="+",
+        choices=sorted(CASES),
+        default=list(CASES),
+    )
+    parser.add_argument("--save", metavar="NAME", help="Save results as a baseline.")
+    parser.add_argument("--compare", metavar="NAME", help="Compare with a baseline.")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        metavar="PERCENT",
+        help="Exit with an error if a compared metric regresses by more than this.",
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    parser.add_argument("--worker", metavar="CASE", help="Run one case in-process.")
+
+    return parser.parse_args()
+
+
+def _config(args: Namespace) -> BenchConfig:
+    return BenchConfig(
+        args.sections,
+        args.items,
+        args.bullets,
+        args.iterations,
+        args.warmup,
+        args.latency,
+    )
+
+
+def _run_worker(name: str, config: BenchConfig) -> None:
+    with TemporaryDirectory(prefix="resume-bench-") as workdir:
+        chdir(workdir)
+        print(dumps(CASES[name](config, Path(workdir))))
+
+
+def _run_case(name: str, args: Namespace) -> dict[str, Any] | None:
+    command = [
+        executable,
+        str(Path(__file__).resolve()),
+        "--worker",
+        name,
+        "--sections",
+        str(args.sections),
+        "--items",
+        str(args.items),
+        "--bullets",
+        str(args.bullets),
+        "--iterations",
+        str(args.iterations),
+        "--warmup",
+        str(args.warmup),
+        "--latency",
+        str(args.latency),
+    ]
+    try:
+        completed = run(
+            command, capture_output=True, text=True, cwd=SOURCE_DIR, check=True
+        )
+
+    except CalledProcessError as e:
+        error = e.stderr.strip().splitlines()
+        print(f"Benchmark {name} failed: {error[-1] if error else e.returncode}")
+        return None
+
+    return loads(completed.stdout.strip().splitlines()[-1])
+
+
+def _environment() -> dict[str, str]:
+    from importlib.metadata import version
+
+    return {
+        "python": python_version(),
+        "python-docx": version("python-docx"),
+        "lxml": version("lxml"),
+        "platform": platform(),
+    }
+
+
+def _print_table(results: dict[str, dict[str, Any]]) -> None:
+    header = (
+        f"{'case':<30}{'ops/s':>10}{'p50 ms':>10}{'p90 ms':>10}"
+        f"{'p99 ms':>10}{'max ms':>10}{'rss MiB':>10}"
+    )
+    print(header)
+    print("-" * len(header))
+
+    for name, m in results.items():
+        print(
+            f"{name:<30}{m['throughput']:>10.1f}{m['p50_ms']:>10.2f}{m['p90_ms']:>10.2f}"
+            f"{m['p99_ms']:>10.2f}{m['max_ms']:>10.2f}{m['peak_rss_mb']:>10.1f}"
+        )
+
+
+def _compare(
+    results: dict[str, dict[str, Any]],
+    baseline: dict[str, Any],
+) -> float:
+    """Print the change of each metric and return the worst regression in %."""
+    worst = 0.0
+
+    if baseline["config"] != results["config"]:
+        print(f"Warning: baseline was recorded with {baseline['config']}")
+
+    print(f"\n{'case':<30}" + "".join(f"{metric:>16}" for metric in COMPARED_METRICS))
+
+    for name, m in results["results"].items():
+        if (before := baseline["results"].get(name)) is None:
+            continue
+
+        cells = []
+
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            if not before[metric]:
+                cells.append(f"{'n/a':>16}")
+                continue
+
+            change = (m[metric] - before[metric]) / before[metric] * 100
+            regression = -change if higher_is_better else change
+            worst = max(worst, regression)
+            cells.append(f"{change:>+15.1f}%")
+
+        print(f"{name:<30}" + "".join(cells))
+
+    return worst
+
+
+def main() -> int:
+    args = _parse_args()
+    config = _config(args)
+
+    if args.worker:
+        _run_worker(args.worker, config)
+        return 0
+
+    results = {
+        "config": config._asdict(),
+        "environment": _environment(),
+        "results": {},
+    }
+
+    for name in args.cases:
+        if (measurement := _run_case(name, args)) is not None:
+            results["results"][name] = measurement
+
+    if args.json:
+        print(dumps(results, indent=2))
+
+    else:
+        _print_table(results["results"])
+
+    if args.save:
+        BASELINES_DIR.mkdir(exist_ok=True)
+        baseline_path = BASELINES_DIR / f"{args.save}.json"
+        baseline_path.write_text(dumps(results, indent=2) + "\n", encoding="utf-8")
+        print(f"\nSaved baseline to {baseline_path}")
+
+    failed = len(args.cases) - len(results["results"])
+
+    if args.compare:
+        baseline = loads((BASELINES_DIR / f"{args.compare}.json").read_text("utf-8"))
+        worst = _compare(results, baseline)
+
+        if args.max_regression is not None and worst > args.max_regression:
+            print(f"\nRegression of {worst:.1f}% exceeds {args.max_regression}%")
+            return 1
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -1,9 +1,60 @@
+from logging import getLogger
+from os import cpu_count, environ
+from time import perf_counter
+
 from mcp import register_mcp_tools
-from robyn import Robyn
+from robyn import Response, Robyn
+from utils.lazy import lazy_import
+from utils.metrics import PROMETHEUS_CONTENT_TYPE, REGISTRY
+
+logger = getLogger(__name__)
+
+# Number of server processes; overrides robyn's --processes when set.
+PROCESSES_ENV = "RESUME_ASSEMBLER_PROCESSES"
+# Where document builds run: "inline", "thread" or "process".
+RENDER_EXECUTOR_ENV = "RESUME_ASSEMBLER_RENDER_EXECUTOR"
+
+docx = lazy_import("renderers.docx")
 
 app = Robyn(__file__)
+app.config.processes = max(1, int(environ.get(PROCESSES_ENV, app.config.processes)))
+
+
+def warmup() -> None:
+    """Import the renderer and run a throwaway render before serving."""
+    start = perf_counter()
+    docx.warmup()
+    logger.info(f"Warmed up renderer in {(perf_counter() - start) * 1000:.0f} ms")
+
+
+app.startup_handler(warmup)
+
+
+@app.get("/metrics")
+def metrics() -> Response:
+    """Serve this process's metrics in the Prometheus text format.
+
+    Every server process keeps its own registry, so with more than one
+    process a scrape only sees the process that took the request. Document
+    builds on the render process pool are recorded by the process that
+    submitted them.
+    """
+    return Response(
+        status_code=200,
+        headers={"Content-Type": PROMETHEUS_CONTENT_TYPE},
+        description=REGISTRY.render(),
+    )
 
-register_mcp_tools(app)
 
+# Only the server registers the tools: render pool workers import this module
+# again as `__mp_main__`, and must not start the workspace threads.
 if __name__ == "__main__":
+    # Processes share the workspace directory, and split the cores between
+    # their batch render pools.
+    register_mcp_tools(
+        app,
+        batch_max_workers=max(1, (cpu_count() or 1) // app.config.processes),
+        multiprocess=app.config.processes > 1,
+        render_executor=environ.get(RENDER_EXECUTOR_ENV, "thread"),
+    )
     app.start()
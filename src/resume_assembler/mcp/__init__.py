@@ -1,6 +1,21 @@
+from typing import TYPE_CHECKING
+
 from mcp.tools import register
-from robyn import BaseRobyn
+from services.render_service import RenderExecutorKind
+
+if TYPE_CHECKING:
+    from robyn import BaseRobyn
 
 
-def register_mcp_tools(app: BaseRobyn) -> None:
-    register(app)
+def register_mcp_tools(
+    app: "BaseRobyn",
+    batch_max_workers: int | None = None,
+    multiprocess: bool = False,
+    render_executor: RenderExecutorKind = "thread",
+) -> None:
+    register(
+        app,
+        batch_max_workers=batch_max_workers,
+        multiprocess=multiprocess,
+        render_executor=render_executor,
+    )
@@ -1,18 +1,68 @@
+from asyncio import get_running_loop
 from collections.abc import Mapping
 from json import dumps
 from logging import getLogger
-from typing import Any
+from typing import TYPE_CHECKING, Any
 from uuid import uuid4
 
-from renderers import docx
-from robyn import BaseRobyn
-from services import WorkspaceService
+from renderers.render_cache import RenderCache
+from services import BatchRenderResult, RenderJob, RenderService, WorkspaceService
+from services.render_service import RenderExecutorKind
+from utils.json_patch import JsonPatchError
+from utils.lazy import lazy_import
+from utils.metrics import timed_tool
 from utils.payload import Payload
+from utils.validation import PayloadValidationError
+
+if TYPE_CHECKING:
+    from robyn import BaseRobyn
 
 logger = getLogger(__name__)
 
+docx = lazy_import("renderers.docx")
+
+LOCAL_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+LOCAL_ARTIFACT_TTL = 24 * 60 * 60
+LOCAL_USER_MAX_BYTES = 64 * 1024 * 1024
+UPLOAD_DRAIN_TIMEOUT = 30.0
+
+BATCH_JOB_FIELDS = ("user_id", "render_id")
+
+
+def _batch_job(job: Any) -> RenderJob | BatchRenderResult:
+    """Return the render job of one batch entry, or its error if malformed.
+
+    The tool's input schema is not enforced, so each entry is checked here
+    and a malformed one fails on its own instead of failing the batch.
+    """
+    if not isinstance(job, Mapping):
+        return BatchRenderResult(None, None, None, "Job must be an object.")
+
+    user_id, render_id = (job.get(field) for field in BATCH_JOB_FIELDS)
+
+    for field in BATCH_JOB_FIELDS:
+        if not isinstance(job.get(field), str):
+            return BatchRenderResult(
+                user_id if isinstance(user_id, str) else None,
+                render_id if isinstance(render_id, str) else None,
+                None,
+                f"Job field {field} must be a string.",
+            )
+
+    if "payload" not in job:
+        return BatchRenderResult(
+            user_id, render_id, None, "Job field payload is required."
+        )
 
-def register(app: BaseRobyn) -> None:
+    return RenderJob(user_id, render_id, job["payload"])
+
+
+def register(
+    app: "BaseRobyn",
+    batch_max_workers: int | None = None,
+    multiprocess: bool = False,
+    render_executor: RenderExecutorKind = "thread",
+) -> None:
     logger.info("Registering docx tools MCP...")
 
     try:
@@ -25,16 +75,44 @@ def register(app: BaseRobyn) -> None:
     logger.info("Successfully obtained MCP from app.")
 
     logger.info("Setting up WorkspaceService...")
-    workspace_service = WorkspaceService(root_parent=".")
+    workspace_service = WorkspaceService(
+        root_parent=".",
+        write_behind=True,
+        max_local_bytes=LOCAL_CACHE_MAX_BYTES,
+        multiprocess=multiprocess,
+        artifact_ttl=LOCAL_ARTIFACT_TTL,
+        max_user_bytes=LOCAL_USER_MAX_BYTES,
+    )
     logger.info("WorkspaceService setup complete.")
 
+    logger.info("Setting up RenderService...")
+    render_service = RenderService(
+        workspace_service,
+        render_cache=RenderCache(),
+        max_workers=batch_max_workers,
+        render_executor=render_executor,
+    )
+    logger.info("RenderService setup complete.")
+
+    def shutdown() -> None:
+        render_service.shutdown()
+
+        if workspace_service.close(timeout=UPLOAD_DRAIN_TIMEOUT):
+            logger.info("Drained the upload queue.")
+
+    app.shutdown_handler(shutdown)
+
     @mcp.tool(name="initialize_resume", description="Initialize a resume workspace.")
-    def initialize_resume(user_id: str) -> str:
+    @timed_tool("initialize_resume")
+    async def initialize_resume(user_id: str) -> str:
         render_id = uuid4().hex
-        workspace_service.create_artifact(user_id, render_id)
-        docx.create_document(
-            workspace_service.get_artifact(user_id, render_id) / "resume.docx"
-        )
+
+        # Uploaded like a render, so the sweeper can delete the local copy
+        # without losing a render_id that was never rendered.
+        def initialize() -> None:
+            workspace_service.write_artifact(user_id, render_id, docx.template_bytes())
+
+        await get_running_loop().run_in_executor(None, initialize)
 
         logger.info(
             f"Initialized resume workspace for user_id: {user_id}, render_id: {render_id}"
@@ -68,14 +146,24 @@ def register(app: BaseRobyn) -> None:
             "required": ["user_id", "render_id", "payload"],
         },
     )
-    def render_resume(
+    @timed_tool("render_resume")
+    async def render_resume(
         user_id: str,
         render_id: str,
         payload: Payload,
     ) -> Mapping[str, Any]:
-        path = workspace_service.get_artifact(user_id, render_id) / "resume.docx"
         try:
-            docx.render(path, payload)
+            result = await render_service.render_async(user_id, render_id, payload)
+
+        except PayloadValidationError as e:
+            logger.info(
+                f"Rejected payload for user_id: {user_id}, render_id: {render_id}: {e}"
+            )
+            return {
+                "ok": False,
+                "message": "Invalid payload.",
+                "errors": [issue.as_dict() for issue in e.issues],
+            }
 
         except Exception as e:
             logger.error(
@@ -85,15 +173,178 @@ def register(app: BaseRobyn) -> None:
 
         logger.info(f"Rendered resume for user_id: {user_id}, render_id: {render_id}")
 
-        workspace_service.save_artifact(user_id, render_id)
+        upload = workspace_service.upload_status(user_id, render_id)
 
         return {
             "ok": True,
             "message": "Rendered resume successfully.",
+            "cached": result.cached,
             "artifact": {
                 "type": "docx",
-                "path": str(path),
+                "path": str(result.path),
+                "upload": upload.value if upload else None,
             },
         }
 
     logger.info(f"Registered {render_resume.__name__} in MCP tools.")
+
+    @mcp.tool(
+        name="render_resumes_batch",
+        description="Render many resume documents in DOCX format in one call.",
+        input_schema={
+            "type": "object",
+            "properties": {
+                "jobs": {
+                    "type": "array",
+                    "description": "The resumes to render.",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "user_id": {
+                                "type": "string",
+                                "description": "The user ID.",
+                            },
+                            "render_id": {
+                                "type": "string",
+                                "description": "The render ID provided upon initialization.",
+                            },
+                            "payload": {
+                                "type": "object",
+                                "description": "The payload containing resume data.",
+                            },
+                        },
+                        "required": ["user_id", "render_id", "payload"],
+                    },
+                },
+            },
+            "required": ["jobs"],
+        },
+    )
+    @timed_tool("render_resumes_batch")
+    async def render_resumes_batch(jobs: list[Mapping[str, Any]]) -> Mapping[str, Any]:
+        if not isinstance(jobs, list):
+            return {"ok": False, "message": "Jobs must be an array.", "results": []}
+
+        results = [_batch_job(job) for job in jobs]
+        valid = [job for job in results if isinstance(job, RenderJob)]
+        rendered = iter(
+            await get_running_loop().run_in_executor(
+                None, render_service.render_batch, valid
+            )
+        )
+        results = [
+            next(rendered) if isinstance(result, RenderJob) else result
+            for result in results
+        ]
+        failed = sum(1 for result in results if result.error is not None)
+
+        logger.info(f"Rendered resume batch of {len(results)} with {failed} failures")
+
+        return {
+            "ok": failed == 0,
+            "message": f"Rendered {len(results) - failed} of {len(results)} resumes.",
+            "results": [result.as_dict() for result in results],
+        }
+
+    logger.info(f"Registered {render_resumes_batch.__name__} in MCP tools.")
+
+    @mcp.tool(
+        name="patch_resume",
+        description=(
+            "Edit the last rendered resume payload with RFC 6902 JSON Patch "
+            "operations and re-render the document. Paths are JSON Pointers "
+            "into the payload, e.g. /content/sections/0/items/1/title."
+        ),
+        input_schema={
+            "type": "object",
+            "properties": {
+                "user_id": {"type": "string", "description": "The user ID."},
+                "render_id": {
+                    "type": "string",
+                    "description": "The render ID of a resume rendered before.",
+                },
+                "patch": {
+                    "type": "array",
+                    "description": "The JSON Patch operations to apply in order.",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "op": {
+                                "type": "string",
+                                "enum": [
+                                    "add",
+                                    "remove",
+                                    "replace",
+                                    "move",
+                                    "copy",
+                                    "test",
+                                ],
+                            },
+                            "path": {"type": "string"},
+                            "from": {"type": "string"},
+                            "value": {},
+                        },
+                        "required": ["op", "path"],
+                    },
+                },
+            },
+            "required": ["user_id", "render_id", "patch"],
+        },
+    )
+    @timed_tool("patch_resume")
+    async def patch_resume(
+        user_id: str,
+        render_id: str,
+        patch: list[Mapping[str, Any]],
+    ) -> Mapping[str, Any]:
+        try:
+            result = await render_service.patch_async(user_id, render_id, patch)
+
+        except FileNotFoundError:
+            return {
+                "ok": False,
+                "message": "No rendered payload to patch; call render_resume first.",
+            }
+
+        except JsonPatchError as e:
+            logger.info(
+                f"Rejected patch for user_id: {user_id}, render_id: {render_id}: {e}"
+            )
+            return {
+                "ok": False,
+                "message": "Invalid patch.",
+                "errors": [{"path": f"patch[{e.index}]", "message": e.message}],
+            }
+
+        except PayloadValidationError as e:
+            logger.info(
+                f"Rejected patched payload for user_id: {user_id}, render_id: {render_id}: {e}"
+            )
+            return {
+                "ok": False,
+                "message": "Invalid payload.",
+                "errors": [issue.as_dict() for issue in e.issues],
+            }
+
+        except Exception as e:
+            logger.error(
+                f"Error patching resume for user_id: {user_id}, render_id: {render_id}: {e}"
+            )
+            raise e
+
+        logger.info(f"Patched resume for user_id: {user_id}, render_id: {render_id}")
+
+        upload = workspace_service.upload_status(user_id, render_id)
+
+        return {
+            "ok": True,
+            "message": "Patched resume successfully.",
+            "cached": result.cached,
+            "artifact": {
+                "type": "docx",
+                "path": str(result.path),
+                "upload": upload.value if upload else None,
+            },
+        }
+
+    logger.info(f"Registered {patch_resume.__name__} in MCP tools.")
@@ -1,22 +1,58 @@
-from collections.abc import Generator, Iterable, Mapping, Sequence
+from collections import deque
+from collections.abc import Generator, Iterable
 from contextlib import contextmanager
+from io import BytesIO
+from logging import getLogger
 from pathlib import Path
-from typing import Any
+from typing import NamedTuple
 
 from docx import Document
 from docx.document import Document as DocumentType
-from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_TAB_ALIGNMENT
-from docx.shared import Inches, Pt
-from docx.text.paragraph import Paragraph
-from docx.text.run import Run
-from utils.payload import Payload
-
-TITLE_STYLE = "Title"
-SUBTITLE_STYLE = "Subtitle"
-BULLET_STYLE = "List Bullet"
-
-SECTION_HEADING = 1
-ITEM_HEADING = 2
+from docx.enum.style import WD_STYLE_TYPE
+from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_TAB_ALIGNMENT, WD_TAB_LEADER
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.oxml.text.paragraph import CT_P
+from docx.shared import Inches, Length, Pt
+from renderers.output import BlockAnchor, RenderAnchors, RenderOutput
+from renderers.plan import (
+    TEXT_STYLES,
+    ParagraphOp,
+    RenderPlan,
+    TextStylePlan,
+    compile_plan,
+    resolve_margins,
+    resolve_text_styles,
+)
+from renderers.template_pool import TemplatePool
+from utils.metrics import timed_stage
+from utils.payload import Payload, ResumeFormatting
+from utils.zip_writer import DEFAULT_COMPRESSION_LEVEL, ZipWriter
+
+try:
+    from docx.opc.pkgwriter import PackageWriter
+
+except ImportError:
+    PackageWriter = None
+
+logger = getLogger(__name__)
+
+TEMPLATE_FORMATTING_FIELDS = ("margins", *TEXT_STYLES)
+
+# Private python-docx methods that `_document_bytes` saves through. The
+# python-docx version is pinned, and saving falls back to `Document.save`
+# should a release rename them.
+_PACKAGE_WRITER_METHODS = (
+    "_write_content_types_stream",
+    "_write_pkg_rels",
+    "_write_parts",
+)
+_REUSE_PARTS = all(hasattr(PackageWriter, method) for method in _PACKAGE_WRITER_METHODS)
+
+if not _REUSE_PARTS:
+    logger.warning(
+        "python-docx has no PackageWriter methods to save through; saving whole packages instead"
+    )
 
 
 def _get_primary_section(doc: DocumentType):
@@ -24,40 +60,117 @@ def _get_primary_section(doc: DocumentType):
     return doc.sections[0]
 
 
-def _write_run_into(
-    paragraph: Paragraph,
-    text: str,
-    font_name: str,
-    font_size: float,
-    **kwargs: dict[str, Any],
-) -> Run:
-    """Write a run to a paragraph with the specified font name and size.
+def _ensure_text_styles(
+    doc: DocumentType,
+    text_styles: Iterable[TextStylePlan],
+) -> dict[str, str]:
+    """Create or update one named character style per text style option.
+
+    Runs reference these styles instead of carrying their own font
+    properties, so each font is written to `styles.xml` once per document.
+
+    Returns:
+        dict[str, str]: The character style ids keyed by formatting field.
+    """
+    existing = {style.name: style for style in doc.styles}
+    style_ids: dict[str, str] = {}
+
+    for key, name, font_name, font_size in text_styles:
+        if (style := existing.get(name)) is None:
+            style = doc.styles.add_style(name, WD_STYLE_TYPE.CHARACTER)
+
+        if style.font.name != font_name:
+            style.font.name = font_name
+
+        if style.font.size != (size := Pt(font_size)):
+            style.font.size = size
+
+        style_ids[key] = style.style_id
+
+    return style_ids
+
+
+@timed_stage("document_open")
+def _open_document(data: bytes) -> DocumentType:
+    """Return a Document object from serialized package bytes.
+
+    Pristine templates are cloned from the template pool instead of parsed.
+    """
+    return _template_pool.checkout_matching(data) or Document(BytesIO(data))
+
+
+class _PackagePartWriter:
+    """Physical package writer for python-docx that writes into a `ZipWriter`."""
+
+    def __init__(self, writer: ZipWriter) -> None:
+        self._writer = writer
+
+    def write(self, pack_uri, blob: bytes) -> None:
+        self._writer.write(pack_uri.membername, blob)
+
+    def close(self) -> None:
+        pass
+
+
+@timed_stage("document_save")
+def _document_bytes(
+    doc: DocumentType,
+    source: bytes | None = None,
+    compression_level: int = DEFAULT_COMPRESSION_LEVEL,
+) -> bytes:
+    """Serialize the document package.
+
+    Parts whose serialized bytes are unchanged from `source`, usually every
+    part but `word/document.xml`, are copied from it without recompressing.
+    Without the private python-docx methods this relies on, the package is
+    saved whole with `Document.save` instead.
 
     Args:
-        paragraph (docx.text.paragraph.Paragraph): The paragraph to write the run to.
-        text (str): The text for the run.
-        font_name (str): The font name for the run.
-        font_size (float): The font size for the run.
+        doc (docx.document.Document): The document to serialize.
+        source (bytes | None): The package the document was opened from.
+        compression_level (int): The zip compression level, 0 to store
+            parts uncompressed.
+    Returns:
+        bytes: The serialized package.
     """
-    run = paragraph.add_run(str(text))
-    run.font.name = str(font_name)
-    run.font.size = Pt(font_size)
+    if not _REUSE_PARTS:
+        buffer = BytesIO()
+        doc.save(buffer)
+
+        return buffer.getvalue()
+
+    package = doc.part.package
+    writer = ZipWriter(source, compression_level)
+    part_writer = _PackagePartWriter(writer)
+
+    # Mirrors `PackageWriter.write`, with the zip writer swapped out.
+    for part in package.parts:
+        part.before_marshal()
 
-    return run
+    PackageWriter._write_content_types_stream(part_writer, package.parts)
+    PackageWriter._write_pkg_rels(part_writer, package.rels)
+    PackageWriter._write_parts(part_writer, package.parts)
+
+    return writer.getvalue()
 
 
 @contextmanager
-def _get_document(path: str | Path) -> Generator[DocumentType, None, None]:
+def _get_document(
+    path: str | Path,
+    compression_level: int = DEFAULT_COMPRESSION_LEVEL,
+) -> Generator[DocumentType, None, None]:
     """Return a Document object from a file path.
 
     Args:
         path (str | Path): The path to the document file.
+        compression_level (int): The zip compression level used when the
+            document is saved back.
     Returns:
         docx.document.Document: The Document object.
     """
     try:
         path = Path(path)
-        doc = Document(str(path))
+        data = path.read_bytes()
 
     except (TypeError, ValueError) as e:
         raise ValueError(f"Invalid path provided: {e}") from e
@@ -65,49 +178,27 @@ def _get_document(path: str | Path) -> Generator[DocumentType, None, None]:
     except FileNotFoundError as e:
         raise FileNotFoundError(f"Document not found at path: {path}") from e
 
+    doc = _open_document(data)
+
     try:
         yield doc
     finally:
-        doc.save(str(path))
-
-
-def _normalize_margins(
-    margins: Sequence[int | float] | Mapping[str, int | float] | None,
-) -> dict[str, int | float | None]:
-    if margins is None:
-        return {}
-
-    keys = ("top", "right", "bottom", "left")
-
-    if isinstance(margins, Mapping):
-        return {k: margins.get(k) for k in keys}
-
-    if isinstance(margins, Sequence) and not isinstance(margins, (str, bytes)):
-        if len(margins) > 4:
-            raise ValueError("Margins sequence cannot have more than 4 values.")
-        return {k: margins[i] if i < len(margins) else None for i, k in enumerate(keys)}
-
-    raise TypeError("Margins must be a sequence or mapping type.")
+        path.write_bytes(_document_bytes(doc, data, compression_level))
 
 
 def _set_margins(
     doc: DocumentType,
-    margins: Sequence[int | float] | Mapping[str, int | float] | None = None,
+    margins: tuple[float, float, float, float],
 ) -> None:
     """Set the document margins.
 
     Args:
         doc (docx.document.Document): The document to set margins for.
-        margins (list[int | float] | dict[str, int | float]): The margins to set.
+        margins (tuple[float, float, float, float]): The resolved top, right,
+            bottom and left margins in inches.
     """
     section = _get_primary_section(doc)
-
-    m = _normalize_margins(margins)
-
-    top = m.get("top") or 1
-    right = m.get("right") or top
-    bottom = m.get("bottom") or top
-    left = m.get("left") or right
+    top, right, bottom, left = margins
 
     section.top_margin = Inches(top)
     section.right_margin = Inches(right)
@@ -115,183 +206,293 @@ def _set_margins(
     section.left_margin = Inches(left)
 
 
-def _add_name(
-    doc: DocumentType,
-    text: str,
-    font_name: str,
-    font_size: float,
-    center: bool = True,
-) -> None:
-    t = doc.add_paragraph(style=TITLE_STYLE)
-
-    if center:
-        t.alignment = WD_ALIGN_PARAGRAPH.CENTER
+def _usable_width(doc: DocumentType) -> Length | None:
+    section = _get_primary_section(doc)
 
-    _write_run_into(t, text, font_name, font_size)
+    if (
+        (width := section.page_width)
+        and (left := section.left_margin)
+        and (right := section.right_margin)
+    ):
+        return width - left - right
 
+    return None
 
-def _add_contact_line(
-    doc: DocumentType,
-    contacts: list[str | dict[str, str]],
-    font_name: str,
-    font_size: float,
-    center: bool = True,
-    sep: str = "|",
-) -> None:
-    contact_line = doc.add_paragraph(style=SUBTITLE_STYLE)
 
-    if center:
-        contact_line.alignment = WD_ALIGN_PARAGRAPH.CENTER
+class _ReplayContext(NamedTuple):
+    paragraph_style_ids: dict[str | None, str | None]
+    text_style_ids: dict[str, str]
+    tab_position: Length | None
 
-    last_contact_idx = len(contacts) - 1
 
-    for i, contact in enumerate(contacts):
-        if isinstance(contact, dict):
-            contact_type = contact.get("type").strip()
-            contact_value = contact.get("value").strip()
+def _paragraph_element(op: ParagraphOp, context: _ReplayContext) -> CT_P:
+    """Build the `w:p` element for a paragraph operation.
 
-            if not contact_value:
-                continue
+    The element is identical to what `add_paragraph`/`add_run` would produce,
+    without creating proxy objects or resolving style names per paragraph.
+    """
+    p = OxmlElement("w:p")
 
-            if contact_type:
-                line = f"{contact_type}: {contact_value}"
-            else:
-                line = contact_value
+    if (style_id := context.paragraph_style_ids[op.style]) is not None:
+        p.get_or_add_pPr().style = style_id
 
-        elif isinstance(contact, str):
-            line = contact.strip()
+    if op.center:
+        p.get_or_add_pPr().jc_val = WD_ALIGN_PARAGRAPH.CENTER
 
-            if not line:
-                continue
+    runs = op.runs
 
+    if op.right_tab:
+        # The last run is right-aligned on a tab stop at the usable width;
+        # without a known width it is dropped.
+        if context.tab_position is None:
+            runs = runs[:-1]
         else:
-            continue
+            p.get_or_add_pPr().get_or_add_tabs().insert_tab_in_order(
+                context.tab_position, WD_TAB_ALIGNMENT.RIGHT, WD_TAB_LEADER.SPACES
+            )
 
-        _write_run_into(contact_line, line, font_name, font_size)
+    for text, text_style in runs:
+        r = p.add_r()
 
-        if i < last_contact_idx:
-            _write_run_into(contact_line, " " + sep + " ", font_name, font_size)
+        if text:
+            r.text = text
 
+        if text_style is not None:
+            r.style = context.text_style_ids[text_style]
 
-def _add_summary(
-    doc: DocumentType,
-    text: str,
-    font_name: str,
-    font_size: float,
-    center: bool = True,
-) -> None:
-    summary = doc.add_paragraph(style=SUBTITLE_STYLE)
+    return p
 
-    if center:
-        summary.alignment = WD_ALIGN_PARAGRAPH.CENTER
 
-    _write_run_into(summary, text, font_name, font_size)
+def _build_template(formatting: ResumeFormatting) -> DocumentType:
+    doc = Document()
+    _set_margins(doc, resolve_margins(formatting.get("margins", None)))
+    _ensure_text_styles(doc, resolve_text_styles(formatting))
 
+    return doc
 
-def _add_section(
-    doc: DocumentType,
-    section_headering: str,
-    items: Iterable[Mapping[str, Any]],
-    font_name: str,
-    font_size: float,
+
+_template_pool = TemplatePool(_build_template, TEMPLATE_FORMATTING_FIELDS)
+
+
+def create_document(
+    doc_path: str | Path,
+    formatting: ResumeFormatting | None = None,
 ) -> None:
-    doc.add_heading(section_headering, level=SECTION_HEADING)
+    """Write a new, empty resume document to the specified path.
 
-    def assemble_date(start: str | None = None, end: str | None = None) -> str | None:
-        if start and end:
-            return f"{start} - {end}"
+    The package is copied from the template pool, so the base template is
+    only parsed once per distinct formatting.
 
-        return start or end or None
+    Args:
+        doc_path (str | Path): The path to write the document to.
+        formatting (ResumeFormatting | None): The formatting the template
+            should be prepared with.
+    """
+    Path(doc_path).write_bytes(template_bytes(formatting))
 
-    for item in items:
-        title = item.get("title")
 
-        if not title:
-            raise ValueError("Section item must have a title.")
+def template_bytes(formatting: ResumeFormatting | None = None) -> bytes:
+    """Return the package of a new, empty resume document.
 
-        date = assemble_date(item.get("start_date"), item.get("end_date"))
+    Args:
+        formatting (ResumeFormatting | None): The formatting the template
+            should be prepared with.
+    Returns:
+        bytes: The serialized package.
+    """
+    return _template_pool.template_bytes(formatting)
 
-        h = doc.add_heading(level=ITEM_HEADING)
-        _write_run_into(h, title, font_name, font_size)
 
-        if date:
-            section = _get_primary_section(doc)
-            if (
-                (width := section.page_width)
-                and (left := section.left_margin)
-                and (right := section.right_margin)
-            ):
-                usable_width = width - left - right
-                h.paragraph_format.tab_stops.add_tab_stop(
-                    usable_width, WD_TAB_ALIGNMENT.RIGHT
-                )
-                _write_run_into(h, "\t" + date, font_name, font_size)
+def _content_elements(doc: DocumentType) -> list:
+    """Return the body elements of the document, excluding section properties."""
+    sect_pr = qn("w:sectPr")
+    return [el for el in doc.element.body if el.tag != sect_pr]
 
-        if content := item.get("content"):
-            p = doc.add_paragraph()
-            _write_run_into(p, content, font_name, font_size)
 
-        for bullet in item.get("bullets", []):
-            b = doc.add_paragraph(style=BULLET_STYLE)
-            _write_run_into(b, bullet, font_name, font_size)
+def _as_plan(payload: Payload | RenderPlan) -> RenderPlan:
+    return payload if isinstance(payload, RenderPlan) else compile_plan(payload)
 
 
-def create_document(doc_path: str | Path) -> None:
-    doc = Document()
-    doc.save(str(doc_path))
+def _build(doc: DocumentType, payload: Payload | RenderPlan) -> None:
+    _build_incremental(doc, _as_plan(payload), None)
+
+
+@timed_stage("document_build")
+def _build_incremental(
+    doc: DocumentType,
+    plan: RenderPlan,
+    anchors: RenderAnchors | None,
+) -> RenderAnchors:
+    """Replay the plan into the document, reusing unchanged blocks.
+
+    Blocks whose input hash matches a block of the previous render keep
+    their existing XML. Only new or changed blocks are emitted, and the
+    elements of blocks that no longer exist are removed. Without usable
+    anchors the existing body content is replaced.
+    """
+    _set_margins(doc, plan.margins)
+
+    paragraph_styles = {
+        op.style for block in plan.blocks for op in block.paragraphs
+    } - {None}
+    context = _ReplayContext(
+        {None: None, **{name: doc.styles[name].style_id for name in paragraph_styles}},
+        _ensure_text_styles(doc, plan.text_styles),
+        _usable_width(doc),
+    )
+
+    existing = _content_elements(doc)
+    previous: dict[str, deque[list]] = {}
+    stale: list = []
+
+    if anchors is not None and (
+        anchors["offset"] + sum(b["length"] for b in anchors["blocks"]) <= len(existing)
+    ):
+        offset = anchors["offset"]
+        start = offset
+
+        for block in anchors["blocks"]:
+            elements = existing[start : start + block["length"]]
+            previous.setdefault(block["hash"], deque()).append(elements)
+            start += block["length"]
+
+    else:
+        # The previous render's metadata is gone, e.g. because the local copy
+        # was deleted, so nothing is known about the body: replace all of it.
+        offset = 0
+        stale.extend(existing)
+
+    ordered: list = []
+    emitted: list[BlockAnchor] = []
+
+    for block in plan.blocks:
+        if reusable := previous.get(block.hash):
+            elements = reusable.popleft()
+
+        else:
+            elements = [_paragraph_element(op, context) for op in block.paragraphs]
+
+        ordered.extend(elements)
+        emitted.append({"hash": block.hash, "length": len(elements)})
+
+    for groups in previous.values():
+        for elements in groups:
+            stale.extend(elements)
+
+    for el in stale:
+        el.getparent().remove(el)
+
+    body = doc.element.body
+    prev = existing[offset - 1] if offset > 0 else None
+
+    for el in ordered:
+        if prev is None:
+            if body[0] is not el:
+                body.insert(0, el)
+
+        elif prev.getnext() is not el:
+            prev.addnext(el)
+
+        prev = el
+
+    return {"offset": offset, "blocks": emitted}
 
 
 def render(
     doc_path: str | Path,
-    payload: Payload,
+    payload: Payload | RenderPlan,
+    compression_level: int = DEFAULT_COMPRESSION_LEVEL,
 ) -> None:
     """Write the resume document to the specified output path.
 
     Args:
         doc_path (str | Path): The path to the document to write.
-        payload (Payload): The payload containing output path information.
+        payload (Payload | RenderPlan): The payload, or a plan compiled from it.
+        compression_level (int): The zip compression level, 0 to store
+            parts uncompressed.
     """
-    with _get_document(doc_path) as doc:
-        formatting = payload.get("formatting", {})
-        content = payload.get("content", {})
-        margins = formatting.get("margins", None)
-        _set_margins(doc, margins)
-
-        title_text = formatting.get("title_text_style", {})
-        _add_name(
-            doc,
-            content.get("name", "Unnamed"),
-            title_text.get("font_name", "Times New Roman"),
-            title_text.get("font_size", 16),
-            title_text.get("center", True),
-        )
-
-        subtitle_text = formatting.get("subtitle_text_style", {})
-        _add_contact_line(
-            doc,
-            content.get("contacts", []),
-            subtitle_text.get("font_name", "Times New Roman"),
-            subtitle_text.get("font_size", 14),
-            subtitle_text.get("center", True),
-        )
-
-        summary_text = formatting.get("summary_text_style", {})
-        _add_summary(
-            doc,
-            content.get("summary", ""),
-            summary_text.get("font_name", "Times New Roman"),
-            summary_text.get("font_size", 11),
-            summary_text.get("center", True),
-        )
-
-        sections_text = formatting.get("sections_text_style", {})
-        sections = content.get("sections", [])
-
-        for section in sections:
-            _add_section(
-                doc,
-                section.get("heading", "Untitled Section"),
-                section.get("items", []),
-                sections_text.get("font_name", "Times New Roman"),
-                sections_text.get("font_size", 11),
-            )
+    with _get_document(doc_path, compression_level) as doc:
+        _build(doc, payload)
+
+
+def render_bytes(
+    source: bytes,
+    payload: Payload | RenderPlan,
+    compression_level: int = DEFAULT_COMPRESSION_LEVEL,
+) -> bytes:
+    """Render the resume into a serialized package without touching disk.
+
+    Args:
+        source (bytes): The serialized document to render into.
+        payload (Payload | RenderPlan): The payload, or a plan compiled from it.
+        compression_level (int): The zip compression level, 0 to store
+            parts uncompressed.
+    Returns:
+        bytes: The serialized rendered document.
+    """
+    doc = _open_document(source)
+    _build(doc, payload)
+
+    return _document_bytes(doc, source, compression_level)
+
+
+def render_incremental(
+    source: bytes,
+    payload: Payload | RenderPlan,
+    anchors: RenderAnchors | None = None,
+    compression_level: int = DEFAULT_COMPRESSION_LEVEL,
+) -> RenderOutput:
+    """Re-render the resume, splicing in only the blocks that changed.
+
+    Args:
+        source (bytes): The serialized document to render into.
+        payload (Payload | RenderPlan): The payload, or a plan compiled from it.
+        anchors (RenderAnchors | None): The anchors returned by the render
+            that produced `source`, if any.
+        compression_level (int): The zip compression level, 0 to store
+            parts uncompressed.
+    Returns:
+        RenderOutput: The serialized document and the anchors to pass to
+            the next render.
+    """
+    doc = _open_document(source)
+    anchors = _build_incremental(doc, _as_plan(payload), anchors)
+
+    return RenderOutput(_document_bytes(doc, source, compression_level), anchors)
+
+
+WARMUP_PAYLOAD: Payload = {
+    "version": "1",
+    "formatting": {},
+    "content": {
+        "name": "Warmup",
+        "contacts": [{"type": "email", "value": "warmup@example.com"}],
+        "summary": "Warmup render.",
+        "sections": [
+            {
+                "heading": "Experience",
+                "items": [
+                    {
+                        "heading": "Warmup",
+                        "start_date": "2024-01",
+                        "end_date": "present",
+                        "content": "Warmup render.",
+                        "bullets": ["Warmup render."],
+                    }
+                ],
+            }
+        ],
+    },
+}
+
+
+def warmup() -> None:
+    """Run a throwaway render so the first real render finds warm caches.
+
+    Parses the default template into the template pool, creates its text
+    styles and exercises the plan compiler, the block builder and package
+    serialization. Nothing is written to disk.
+    """
+    source = _template_pool.template_bytes()
+    output = render_incremental(source, WARMUP_PAYLOAD)
+    render_incremental(output.data, WARMUP_PAYLOAD, output.anchors)
@@ -0,0 +1,22 @@
+from typing import NamedTuple, TypedDict
+
+
+class BlockAnchor(TypedDict):
+    hash: str
+    length: int
+
+
+class RenderAnchors(TypedDict):
+    """Where the blocks of the previous render live in the document body.
+
+    `offset` is the index of the first emitted body element, and each block
+    records the hash of its input and how many body elements it emitted.
+    """
+
+    offset: int
+    blocks: list[BlockAnchor]
+
+
+class RenderOutput(NamedTuple):
+    data: bytes
+    anchors: RenderAnchors
@@ -0,0 +1,286 @@
+from collections.abc import Iterable, Mapping, Sequence
+from typing import Any, NamedTuple
+
+from utils.date_formatter import format_date_strings
+from utils.hashing import canonical_hash
+from utils.payload import Payload, ResumeFormatting
+
+TITLE_STYLE = "Title"
+SUBTITLE_STYLE = "Subtitle"
+BULLET_STYLE = "List Bullet"
+
+SECTION_HEADING = 1
+ITEM_HEADING = 2
+
+TITLE_TEXT_STYLE = "title_text_style"
+SUBTITLE_TEXT_STYLE = "subtitle_text_style"
+SUMMARY_TEXT_STYLE = "summary_text_style"
+SECTIONS_TEXT_STYLE = "sections_text_style"
+
+DEFAULT_FONT_NAME = "Times New Roman"
+
+# Formatting key -> (character style name, default font size)
+TEXT_STYLES: Mapping[str, tuple[str, float]] = {
+    TITLE_TEXT_STYLE: ("Resume Title Text", 16),
+    SUBTITLE_TEXT_STYLE: ("Resume Subtitle Text", 14),
+    SUMMARY_TEXT_STYLE: ("Resume Summary Text", 11),
+    SECTIONS_TEXT_STYLE: ("Resume Section Text", 11),
+}
+
+HEADER_BLOCK = "header"
+SECTION_BLOCK = "section"
+
+
+class RunOp(NamedTuple):
+    text: str
+    text_style: str | None
+
+
+class ParagraphOp(NamedTuple):
+    """One body paragraph. With `right_tab`, the last run sits on a right tab."""
+
+    style: str | None
+    runs: tuple[RunOp, ...]
+    center: bool = False
+    right_tab: bool = False
+
+
+class BlockPlan(NamedTuple):
+    hash: str
+    paragraphs: tuple[ParagraphOp, ...]
+
+
+class TextStylePlan(NamedTuple):
+    key: str
+    name: str
+    font_name: str
+    font_size: float
+
+
+class RenderPlan(NamedTuple):
+    """An immutable, fully resolved description of a resume render.
+
+    Formatting defaults, text styles, margins and date strings are resolved
+    at compile time, and the content is flattened into paragraph operations
+    grouped by re-renderable block. Plans are plain tuples, so they can be
+    cached, compared, pickled to worker processes and replayed into any
+    number of documents.
+    """
+
+    payload_hash: str
+    margins: tuple[float, float, float, float]
+    text_styles: tuple[TextStylePlan, ...]
+    blocks: tuple[BlockPlan, ...]
+
+
+def normalize_margins(
+    margins: Sequence[int | float] | Mapping[str, int | float] | None,
+) -> dict[str, int | float | None]:
+    if margins is None:
+        return {}
+
+    keys = ("top", "right", "bottom", "left")
+
+    if isinstance(margins, Mapping):
+        return {k: margins.get(k) for k in keys}
+
+    if isinstance(margins, Sequence) and not isinstance(margins, (str, bytes)):
+        if len(margins) > 4:
+            raise ValueError("Margins sequence cannot have more than 4 values.")
+        return {k: margins[i] if i < len(margins) else None for i, k in enumerate(keys)}
+
+    raise TypeError("Margins must be a sequence or mapping type.")
+
+
+def resolve_margins(
+    margins: Sequence[int | float] | Mapping[str, int | float] | None,
+) -> tuple[float, float, float, float]:
+    """Resolve margins to `(top, right, bottom, left)` inches with defaults."""
+    m = normalize_margins(margins)
+
+    top = m.get("top") or 1
+    right = m.get("right") or top
+    bottom = m.get("bottom") or top
+    left = m.get("left") or right
+
+    return (top, right, bottom, left)
+
+
+def resolve_text_styles(formatting: ResumeFormatting) -> tuple[TextStylePlan, ...]:
+    return tuple(
+        TextStylePlan(
+            key,
+            name,
+            str(formatting.get(key, {}).get("font_name", DEFAULT_FONT_NAME)),
+            formatting.get(key, {}).get("font_size", default_size),
+        )
+        for key, (name, default_size) in TEXT_STYLES.items()
+    )
+
+
+def _payload_dates(content: Mapping[str, Any]) -> Iterable[str | None]:
+    for section in content.get("sections", []):
+        for item in section.get("items", []):
+            yield item.get("start_date")
+            yield item.get("end_date")
+
+
+def _assemble_date(
+    dates: Mapping[str, str],
+    start: str | None = None,
+    end: str | None = None,
+) -> str | None:
+    start = dates.get(start, start) if start else start
+    end = dates.get(end, end) if end else end
+
+    if start and end:
+        return f"{start} - {end}"
+
+    return start or end or None
+
+
+def _contact_runs(contacts: Sequence[Any], sep: str = "|") -> tuple[RunOp, ...]:
+    runs: list[RunOp] = []
+    last_contact_idx = len(contacts) - 1
+
+    for i, contact in enumerate(contacts):
+        if isinstance(contact, dict):
+            contact_type = (contact.get("type") or "").strip()
+            contact_value = (contact.get("value") or "").strip()
+
+            if not contact_value:
+                continue
+
+            if contact_type:
+                line = f"{contact_type}: {contact_value}"
+            else:
+                line = contact_value
+
+        elif isinstance(contact, str):
+            line = contact.strip()
+
+            if not line:
+                continue
+
+        else:
+            continue
+
+        runs.append(RunOp(line, SUBTITLE_TEXT_STYLE))
+
+        if i < last_contact_idx:
+            runs.append(RunOp(" " + sep + " ", SUBTITLE_TEXT_STYLE))
+
+    return tuple(runs)
+
+
+def _header_paragraphs(
+    formatting: ResumeFormatting,
+    content: Mapping[str, Any],
+) -> tuple[ParagraphOp, ...]:
+    return (
+        ParagraphOp(
+            TITLE_STYLE,
+            (RunOp(str(content.get("name", "Unnamed")), TITLE_TEXT_STYLE),),
+            center=bool(formatting.get(TITLE_TEXT_STYLE, {}).get("center", True)),
+        ),
+        ParagraphOp(
+            SUBTITLE_STYLE,
+            _contact_runs(content.get("contacts", [])),
+            center=bool(formatting.get(SUBTITLE_TEXT_STYLE, {}).get("center", True)),
+        ),
+        ParagraphOp(
+            SUBTITLE_STYLE,
+            (RunOp(str(content.get("summary", "")), SUMMARY_TEXT_STYLE),),
+            center=bool(formatting.get(SUMMARY_TEXT_STYLE, {}).get("center", True)),
+        ),
+    )
+
+
+def _section_paragraphs(
+    heading: str,
+    items: Iterable[Mapping[str, Any]],
+    dates: Mapping[str, str],
+) -> tuple[ParagraphOp, ...]:
+    heading = str(heading)
+    paragraphs = [
+        ParagraphOp(
+            f"Heading {SECTION_HEADING}",
+            (RunOp(heading, None),) if heading else (),
+        )
+    ]
+
+    for item in items:
+        title = item.get("title") or item.get("heading")
+
+        if not title:
+            raise ValueError("Section item must have a title.")
+
+        runs = [RunOp(str(title), SECTIONS_TEXT_STYLE)]
+
+        if date := _assemble_date(dates, item.get("start_date"), item.get("end_date")):
+            runs.append(RunOp("\t" + date, SECTIONS_TEXT_STYLE))
+
+        paragraphs.append(
+            ParagraphOp(f"Heading {ITEM_HEADING}", tuple(runs), right_tab=bool(date))
+        )
+
+        if content := item.get("content"):
+            paragraphs.append(
+                ParagraphOp(None, (RunOp(str(content), SECTIONS_TEXT_STYLE),))
+            )
+
+        for bullet in item.get("bullets") or ():
+            paragraphs.append(
+                ParagraphOp(BULLET_STYLE, (RunOp(str(bullet), SECTIONS_TEXT_STYLE),))
+            )
+
+    return tuple(paragraphs)
+
+
+def compile_plan(payload: Payload) -> RenderPlan:
+    """Compile a payload into an immutable render plan.
+
+    Args:
+        payload (Payload): The payload containing resume data.
+    Returns:
+        RenderPlan: The resolved plan.
+    Raises:
+        ValueError: If the payload cannot be rendered.
+    """
+    formatting = payload.get("formatting", {})
+    content = payload.get("content", {})
+    dates = format_date_strings(
+        _payload_dates(content),
+        formatting.get("item_date_style", {}).get("date_format"),
+    )
+
+    header_input = {
+        "name": content.get("name"),
+        "contacts": content.get("contacts"),
+        "summary": content.get("summary"),
+    }
+    blocks = [
+        BlockPlan(
+            canonical_hash([HEADER_BLOCK, formatting, header_input]),
+            _header_paragraphs(formatting, content),
+        )
+    ]
+
+    for section in content.get("sections", []):
+        blocks.append(
+            BlockPlan(
+                canonical_hash([SECTION_BLOCK, formatting, section]),
+                _section_paragraphs(
+                    section.get("heading", "Untitled Section"),
+                    section.get("items", []),
+                    dates,
+                ),
+            )
+        )
+
+    return RenderPlan(
+        canonical_hash(payload),
+        resolve_margins(formatting.get("margins", None)),
+        resolve_text_styles(formatting),
+        tuple(blocks),
+    )
@@ -0,0 +1,66 @@
+from collections import OrderedDict
+from threading import Lock
+
+from renderers.output import RenderOutput
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class RenderCache:
+    """Size-bounded LRU of rendered packages shared across users.
+
+    Entries are keyed by the digest of the source package (and its render
+    anchors) together with the canonical payload hash, so two users rendering
+    the same payload onto the same template share one entry.
+
+    Args:
+        max_bytes (int): The total size of cached packages before the least
+            recently used entries are evicted.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        if max_bytes < 0:
+            raise ValueError("Render cache size cannot be negative.")
+
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple[str, str], RenderOutput] = OrderedDict()
+        self._size = 0
+        self._lock = Lock()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, source_hash: str, payload_hash: str) -> RenderOutput | None:
+        key = (source_hash, payload_hash)
+
+        with self._lock:
+            if (output := self._entries.get(key)) is not None:
+                self._entries.move_to_end(key)
+
+            return output
+
+    def put(self, source_hash: str, payload_hash: str, output: RenderOutput) -> None:
+        if len(output.data) > self.max_bytes:
+            return
+
+        key = (source_hash, payload_hash)
+
+        with self._lock:
+            if (previous := self._entries.pop(key, None)) is not None:
+                self._size -= len(previous.data)
+
+            self._entries[key] = output
+            self._size += len(output.data)
+
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.data)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
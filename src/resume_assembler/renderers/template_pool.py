@@ -0,0 +1,113 @@
+from collections import OrderedDict
+from collections.abc import Callable, Mapping, Sequence
+from copy import deepcopy
+from io import BytesIO
+from threading import Lock
+from typing import Any, NamedTuple
+
+from docx.document import Document as DocumentType
+from utils.hashing import bytes_hash, canonical_hash
+
+DEFAULT_MAX_TEMPLATES = 32
+
+
+class _Template(NamedTuple):
+    prototype: DocumentType
+    data: bytes
+    digest: str
+
+
+class TemplatePool:
+    """Process-wide pool of parsed base documents keyed by formatting.
+
+    Parsing python-docx's default package is a fixed cost paid on every
+    `Document()` call. The pool builds each distinct template once, keeps the
+    parsed document as a prototype together with its serialized bytes, and
+    hands out deep copies, which are considerably cheaper than a re-parse.
+
+    Args:
+        build (Callable[[Mapping[str, Any]], DocumentType]): Builds a fresh
+            template document for the given formatting.
+        key_fields (Sequence[str]): The formatting fields that affect the
+            template. Other fields are ignored when computing the pool key.
+        max_size (int): The maximum number of templates kept in the pool.
+    """
+
+    def __init__(
+        self,
+        build: Callable[[Mapping[str, Any]], DocumentType],
+        key_fields: Sequence[str],
+        max_size: int = DEFAULT_MAX_TEMPLATES,
+    ) -> None:
+        if max_size < 1:
+            raise ValueError("Template pool size must be at least 1.")
+
+        self._build = build
+        self._key_fields = tuple(key_fields)
+        self._max_size = max_size
+        self._templates: OrderedDict[str, _Template] = OrderedDict()
+        self._keys_by_digest: dict[str, str] = {}
+        self._lock = Lock()
+
+    def key(self, formatting: Mapping[str, Any] | None = None) -> str:
+        """Return the pool key for the template-relevant part of `formatting`."""
+        formatting = formatting or {}
+        return canonical_hash({k: formatting.get(k) for k in self._key_fields})
+
+    def _get(self, formatting: Mapping[str, Any] | None) -> _Template:
+        key = self.key(formatting)
+
+        with self._lock:
+            if (template := self._templates.get(key)) is not None:
+                self._templates.move_to_end(key)
+                return template
+
+        doc = self._build(formatting or {})
+        buffer = BytesIO()
+        doc.save(buffer)
+        data = buffer.getvalue()
+        template = _Template(doc, data, bytes_hash(data))
+
+        with self._lock:
+            if (existing := self._templates.get(key)) is not None:
+                return existing
+
+            self._templates[key] = template
+            self._keys_by_digest[template.digest] = key
+
+            while len(self._templates) > self._max_size:
+                _, evicted = self._templates.popitem(last=False)
+                self._keys_by_digest.pop(evicted.digest, None)
+
+        return template
+
+    def template_bytes(self, formatting: Mapping[str, Any] | None = None) -> bytes:
+        """Return the serialized template package for `formatting`."""
+        return self._get(formatting).data
+
+    def checkout(self, formatting: Mapping[str, Any] | None = None) -> DocumentType:
+        """Return a private copy of the template document for `formatting`."""
+        return deepcopy(self._get(formatting).prototype)
+
+    def checkout_matching(self, data: bytes) -> DocumentType | None:
+        """Return a copy of the pooled template whose package equals `data`.
+
+        Freshly created artifacts are byte-for-byte copies of a pooled
+        template, so they can be cloned instead of re-parsed. Returns `None`
+        when `data` is not a known template.
+        """
+        digest = bytes_hash(data)
+
+        with self._lock:
+            key = self._keys_by_digest.get(digest)
+            template = self._templates.get(key) if key is not None else None
+
+        if template is None:
+            return None
+
+        return deepcopy(template.prototype)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._templates.clear()
+            self._keys_by_digest.clear()
@@ -1,5 +1,15 @@
+from services.render_service import (
+    BatchRenderResult,
+    RenderJob,
+    RenderResult,
+    RenderService,
+)
 from services.workspace_service import WorkspaceService
 
 __all__ = [
+    "BatchRenderResult",
+    "RenderJob",
+    "RenderResult",
+    "RenderService",
     "WorkspaceService",
 ]
@@ -0,0 +1,438 @@
+from asyncio import get_running_loop
+from collections.abc import Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+from logging import getLogger
+from pathlib import Path
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Literal, NamedTuple
+
+from renderers.output import RenderOutput
+from renderers.plan import RenderPlan, compile_plan
+from renderers.render_cache import RenderCache
+from services.workspace_service import WorkspaceService
+from utils.hashing import bytes_hash, canonical_hash
+from utils.json_patch import apply_patch
+from utils.lazy import lazy_import
+from utils.metrics import StageRecord, call_recording_stages, merge_stages
+from utils.payload import Payload
+from utils.validation import (
+    PayloadValidationError,
+    subtree_issues,
+    validate_payload,
+)
+from utils.zip_writer import DEFAULT_COMPRESSION_LEVEL, compression_method
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+logger = getLogger(__name__)
+
+# python-docx is only imported once something is rendered.
+docx = lazy_import("renderers.docx")
+
+PAYLOAD_HASH_KEY = "payload_hash"
+ARTIFACT_HASH_KEY = "artifact_hash"
+ANCHORS_KEY = "anchors"
+
+# Where document builds run: on the calling thread, on a thread pool, or on
+# the process pool that batches also use.
+RenderExecutorKind = Literal["inline", "thread", "process"]
+
+RENDER_POOL_START_METHOD = "forkserver"
+
+
+def _pool_output(future: Future[tuple[RenderOutput, StageRecord]]) -> RenderOutput:
+    output, stages = future.result()
+    merge_stages(stages)
+
+    return output
+
+
+class RenderResult(NamedTuple):
+    path: Path
+    cached: bool
+
+
+class RenderJob(NamedTuple):
+    user_id: str
+    process_id: str
+    payload: Payload
+
+
+class BatchRenderResult(NamedTuple):
+    # `None` when a malformed batch job did not carry the id.
+    user_id: str | None
+    process_id: str | None
+    result: RenderResult | None
+    error: str | None
+
+    def as_dict(self) -> dict[str, Any]:
+        if self.result is None:
+            return {
+                "ok": False,
+                "user_id": self.user_id,
+                "render_id": self.process_id,
+                "error": self.error,
+            }
+
+        return {
+            "ok": True,
+            "user_id": self.user_id,
+            "render_id": self.process_id,
+            "cached": self.result.cached,
+            "path": str(self.result.path),
+        }
+
+
+class _PreparedRender(NamedTuple):
+    job: RenderJob
+    path: Path
+    plan: RenderPlan
+    metadata: dict[str, Any]
+    source: bytes
+    source_hash: str
+
+
+class RenderService:
+    def __init__(
+        self,
+        workspace_service: WorkspaceService,
+        render_cache: RenderCache | None = None,
+        max_workers: int | None = None,
+        render_executor: RenderExecutorKind = "inline",
+        compression_level: int = DEFAULT_COMPRESSION_LEVEL,
+    ) -> None:
+        if render_executor not in ("inline", "thread", "process"):
+            raise ValueError(f"Unknown render executor: {render_executor}")
+
+        compression_method(compression_level)
+
+        self.workspace_service = workspace_service
+        self.render_cache = render_cache
+        self.max_workers = max_workers
+        self.render_executor = render_executor
+        self.compression_level = compression_level
+        self._executor: "ProcessPoolExecutor | None" = None
+        self._thread_executor: ThreadPoolExecutor | None = None
+        self._executor_lock = Lock()
+
+    def render(
+        self,
+        user_id: str,
+        process_id: str,
+        payload: Payload,
+    ) -> RenderResult:
+        """Render the payload into the artifact unless it is already current.
+
+        The canonical payload hash is recorded in the artifact metadata. A
+        render whose hash matches the recorded one skips both the document
+        build and the upload. Otherwise the block anchors of the previous
+        render are used to splice in only the sections that changed.
+        """
+        return self._render(RenderJob(user_id, process_id, payload), offload=False)
+
+    async def render_async(
+        self,
+        user_id: str,
+        process_id: str,
+        payload: Payload,
+    ) -> RenderResult:
+        """Render like `render` without blocking the running event loop.
+
+        The payload is validated on the loop so malformed calls fail at once.
+        The locked read, build and write sequence then runs on the loop's
+        default thread pool, and the document build inside it is handed to
+        the configured render executor.
+        """
+        validate_payload(payload)
+        job = RenderJob(user_id, process_id, payload)
+
+        # Offloaded, and not validated a second time.
+        return await get_running_loop().run_in_executor(
+            None, self._render, job, True, False
+        )
+
+    def patch(
+        self,
+        user_id: str,
+        process_id: str,
+        operations: list[Any],
+    ) -> RenderResult:
+        """Apply a JSON Patch to the artifact's last payload and re-render it.
+
+        The payload recorded by the previous render is patched in place, and
+        only the locations the patch touched are validated. The patched
+        payload then renders like any other, so only changed sections are
+        rebuilt, and it becomes the payload the next patch applies to.
+
+        Raises:
+            FileNotFoundError: If no render of the artifact recorded a payload.
+            JsonPatchError: If an operation is malformed or cannot be applied.
+            PayloadValidationError: If the patched payload is malformed.
+        """
+        return self._patch(user_id, process_id, operations, offload=False)
+
+    async def patch_async(
+        self,
+        user_id: str,
+        process_id: str,
+        operations: list[Any],
+    ) -> RenderResult:
+        """Patch and re-render like `patch` without blocking the event loop."""
+        return await get_running_loop().run_in_executor(
+            None, self._patch, user_id, process_id, operations, True
+        )
+
+    def _patch(
+        self,
+        user_id: str,
+        process_id: str,
+        operations: list[Any],
+        offload: bool,
+    ) -> RenderResult:
+        # The lock spans read, patch and render, so concurrent patches of one
+        # artifact apply one after the other instead of losing updates.
+        with self.workspace_service.lock(user_id, process_id):
+            payload = self.workspace_service.read_payload(user_id, process_id)
+
+            if payload is None:
+                raise FileNotFoundError(
+                    f"No rendered payload recorded for user_id: {user_id}, render_id: {process_id}"
+                )
+
+            payload, touched = apply_patch(payload, operations)
+
+            if issues := subtree_issues(payload, touched):
+                raise PayloadValidationError(issues)
+
+            job = RenderJob(user_id, process_id, payload)
+
+            return self._render(job, offload, validate=False)
+
+    def _render(
+        self,
+        job: RenderJob,
+        offload: bool,
+        validate: bool = True,
+    ) -> RenderResult:
+        with self.workspace_service.lock(job.user_id, job.process_id):
+            prepared = self._prepare(job, validate)
+
+            if isinstance(prepared, RenderResult):
+                return prepared
+
+            output = self._cached_output(prepared)
+
+            if output is None:
+                output = self._build(prepared, offload)
+
+            return self._commit(prepared, output)
+
+    def _build(self, prepared: _PreparedRender, offload: bool) -> RenderOutput:
+        args = (
+            prepared.source,
+            prepared.plan,
+            prepared.metadata.get(ANCHORS_KEY),
+            self.compression_level,
+        )
+
+        if not offload or self.render_executor == "inline":
+            return docx.render_incremental(*args)
+
+        if self.render_executor == "process":
+            return _pool_output(self._submit_to_pool(*args))
+
+        return (
+            self._get_thread_executor().submit(docx.render_incremental, *args).result()
+        )
+
+    def render_batch(self, jobs: Iterable[RenderJob]) -> list[BatchRenderResult]:
+        """Render many artifacts, spreading document builds across processes.
+
+        Storage reads and writes stay in the calling process; only the
+        python-docx work is sent to the process pool. A failing job is
+        reported in its result and does not affect the rest of the batch.
+        Each artifact is only locked while it is prepared and while it is
+        committed, so the batch never blocks other renders during builds.
+        An artifact that changed in between is rendered again at commit.
+        """
+        jobs = list(jobs)
+        results: list[BatchRenderResult | None] = [None] * len(jobs)
+        pending: list[
+            tuple[int, _PreparedRender, Future[tuple[RenderOutput, StageRecord]]]
+        ] = []
+        ready: list[tuple[int, _PreparedRender, RenderOutput]] = []
+
+        for index, job in enumerate(jobs):
+            try:
+                with self.workspace_service.lock(*job[:2]):
+                    prepared = self._prepare(job)
+
+                if isinstance(prepared, RenderResult):
+                    results[index] = BatchRenderResult(*job[:2], prepared, None)
+                    continue
+
+                if (output := self._cached_output(prepared)) is not None:
+                    ready.append((index, prepared, output))
+                    continue
+
+                future = self._submit_to_pool(
+                    prepared.source,
+                    prepared.plan,
+                    prepared.metadata.get(ANCHORS_KEY),
+                    self.compression_level,
+                )
+                pending.append((index, prepared, future))
+
+            except Exception as e:
+                results[index] = self._failed(job, e)
+
+        for index, prepared, future in pending:
+            try:
+                ready.append((index, prepared, _pool_output(future)))
+
+            except Exception as e:
+                results[index] = self._failed(prepared.job, e)
+
+        for index, prepared, output in sorted(ready, key=lambda r: r[0]):
+            try:
+                result = self._commit_if_current(prepared, output)
+                results[index] = BatchRenderResult(*prepared.job[:2], result, None)
+
+            except Exception as e:
+                results[index] = self._failed(prepared.job, e)
+
+        return results
+
+    def _commit_if_current(
+        self,
+        prepared: _PreparedRender,
+        output: RenderOutput,
+    ) -> RenderResult:
+        user_id, process_id, _ = prepared.job
+
+        with self.workspace_service.lock(user_id, process_id):
+            # Every commit rewrites the metadata, so equal metadata means the
+            # artifact the output was built from is still the current one.
+            if self.workspace_service.read_metadata(user_id, process_id) == (
+                prepared.metadata
+            ):
+                return self._commit(prepared, output)
+
+            logger.info(
+                f"Artifact changed during the batch for user_id: {user_id}, render_id: {process_id}; rendering again."
+            )
+
+            return self._render(prepared.job, offload=False, validate=False)
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+            if self._thread_executor is not None:
+                self._thread_executor.shutdown()
+                self._thread_executor = None
+
+    def _get_thread_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._thread_executor is None:
+                self._thread_executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="render"
+                )
+
+            return self._thread_executor
+
+    def _get_executor(self) -> "ProcessPoolExecutor":
+        # Imported here: the process pool machinery is only needed for batches.
+        from concurrent.futures import ProcessPoolExecutor
+        from multiprocessing import get_context
+
+        with self._executor_lock:
+            if self._executor is None:
+                # Workers are forked from a fork server instead of from this
+                # process, so they do not inherit its storage and sweeper
+                # threads. The server preloads the renderer for them.
+                context = get_context(RENDER_POOL_START_METHOD)
+                context.set_forkserver_preload([docx.__name__])
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=context,
+                    initializer=docx.warmup,
+                )
+
+            return self._executor
+
+    def _submit_to_pool(self, *args: Any) -> Future[tuple[RenderOutput, StageRecord]]:
+        """Build a document on the process pool, keeping its stage timings."""
+        return self._get_executor().submit(
+            call_recording_stages, docx.render_incremental, *args
+        )
+
+    def _failed(self, job: RenderJob, error: Exception) -> BatchRenderResult:
+        logger.error(
+            f"Error rendering resume for user_id: {job.user_id}, render_id: {job.process_id}: {error}"
+        )
+        return BatchRenderResult(job.user_id, job.process_id, None, str(error))
+
+    def _prepare(
+        self,
+        job: RenderJob,
+        validate: bool = True,
+    ) -> _PreparedRender | RenderResult:
+        user_id, process_id, payload = job
+
+        if validate:
+            validate_payload(payload)
+
+        path = self.workspace_service.artifact_path(user_id, process_id)
+        plan = compile_plan(payload)
+        metadata = self.workspace_service.read_metadata(user_id, process_id)
+
+        if metadata.get(PAYLOAD_HASH_KEY) == plan.payload_hash:
+            # An unchanged payload only skips the render once its artifact is
+            # durable; otherwise rendering again resubmits the upload.
+            if not self.workspace_service.upload_outstanding(user_id, process_id):
+                logger.info(
+                    f"Payload unchanged for user_id: {user_id}, render_id: {process_id}; skipping render."
+                )
+                return RenderResult(path, cached=True)
+
+            logger.info(
+                f"Payload unchanged for user_id: {user_id}, render_id: {process_id}, but its upload has not landed; rendering again."
+            )
+
+        source = self.workspace_service.read_artifact(user_id, process_id)
+        source_hash = canonical_hash([bytes_hash(source), metadata.get(ANCHORS_KEY)])
+
+        return _PreparedRender(job, path, plan, metadata, source, source_hash)
+
+    def _cached_output(self, prepared: _PreparedRender) -> RenderOutput | None:
+        if self.render_cache is None:
+            return None
+
+        return self.render_cache.get(prepared.source_hash, prepared.plan.payload_hash)
+
+    def _commit(self, prepared: _PreparedRender, output: RenderOutput) -> RenderResult:
+        user_id, process_id, _ = prepared.job
+
+        if self.render_cache is not None:
+            self.render_cache.put(
+                prepared.source_hash, prepared.plan.payload_hash, output
+            )
+
+        self.workspace_service.write_artifact(user_id, process_id, output.data)
+        self.workspace_service.write_payload(user_id, process_id, prepared.job.payload)
+        self.workspace_service.write_metadata(
+            user_id,
+            process_id,
+            {
+                **prepared.metadata,
+                PAYLOAD_HASH_KEY: prepared.plan.payload_hash,
+                ARTIFACT_HASH_KEY: bytes_hash(output.data),
+                ANCHORS_KEY: output.anchors,
+            },
+        )
+
+        return RenderResult(prepared.path, cached=False)
@@ -1,6 +1,27 @@
+from collections.abc import Generator
+from contextlib import AbstractContextManager, contextmanager
+from logging import getLogger
 from pathlib import Path
+from typing import Any
 
 from storage import workspace
+from storage.manifest import (
+    DEFAULT_SWEEP_LIMIT,
+    ArtifactManifest,
+    SharedArtifactManifest,
+)
+from storage.online.blob_storage import OnlineStorage
+from storage.online.dedup_storage import DeduplicatingStorage
+from storage.online.existence_cache import ExistenceCachingStorage
+from storage.online.resilient_storage import ResilientOnlineStorage
+from storage.sweeper import DEFAULT_SWEEP_INTERVAL, WorkspaceSweeper
+from storage.upload_queue import UploadQueue, UploadStatus
+from utils.concurrency import FileLocks, KeyedLocks
+from utils.hashing import bytes_hash
+from utils.metrics import stage_timer
+from utils.payload import Payload
+
+logger = getLogger(__name__)
 
 
 class WorkspaceServiceSingletonMeta(type):
@@ -14,11 +35,214 @@ class WorkspaceServiceSingletonMeta(type):
 
 
 class WorkspaceService(metaclass=WorkspaceServiceSingletonMeta):
+    """Local workspace of artifacts backed by online storage.
+
+    With `multiprocess`, several server processes may share the workspace
+    directory: artifact locks are `flock`s that also exclude the other
+    processes, and the manifest is a SQLite database shared by all of them.
+
+    With `artifact_ttl` or `max_user_bytes`, a background sweeper deletes
+    uploaded local copies that have not been accessed within the TTL, and the
+    least recently used uploaded copies of users over their byte quota. Each
+    pass deletes at most `sweep_batch` artifacts, starting from the oldest.
+
+    A deleted or evicted artifact loses its whole local directory, metadata
+    and payload included, and `reconcile` repairs the manifest and workspace
+    at startup. Payloads are also uploaded next to their artifacts, and
+    read back from online storage once their local copy is gone.
+
+    With `deduplicate_parts`, artifacts are uploaded to `online_storage` as
+    content-addressed package parts, so parts shared between artifacts are
+    stored once.
+    """
+
     def __init__(
         self,
         root_parent: str,
+        keep_local_copy: bool = True,
+        write_behind: bool = False,
+        max_local_bytes: int | None = None,
+        online_storage: OnlineStorage | None = None,
+        multiprocess: bool = False,
+        artifact_ttl: float | None = None,
+        max_user_bytes: int | None = None,
+        sweep_interval: float = DEFAULT_SWEEP_INTERVAL,
+        sweep_batch: int = DEFAULT_SWEEP_LIMIT,
+        deduplicate_parts: bool = False,
     ) -> None:
+        if online_storage is not None:
+            if deduplicate_parts:
+                online_storage = DeduplicatingStorage(online_storage)
+
+            workspace.online_storage = ExistenceCachingStorage(
+                ResilientOnlineStorage(online_storage)
+            )
+
         self.workspace_dir = workspace.create_workspace(root_parent)
+        self.keep_local_copy = keep_local_copy
+        self.upload_queue = UploadQueue(self._upload) if write_behind else None
+        self.multiprocess = multiprocess
+
+        if multiprocess:
+            self.manifest = SharedArtifactManifest(
+                self.workspace_dir / workspace.SHARED_MANIFEST_FILENAME,
+                max_bytes=max_local_bytes,
+            )
+            self._artifact_locks: KeyedLocks | FileLocks = FileLocks(
+                lambda key: workspace.lock_path(self.workspace_dir, *key)
+            )
+        else:
+            self.manifest = ArtifactManifest(
+                self.workspace_dir / workspace.MANIFEST_FILENAME,
+                max_bytes=max_local_bytes,
+            )
+            self._artifact_locks = KeyedLocks()
+
+        self.artifact_ttl = artifact_ttl
+        self.max_user_bytes = max_user_bytes
+        self.sweep_batch = sweep_batch
+        self.reconcile()
+        self.sweeper = (
+            WorkspaceSweeper(
+                lambda: len(self.sweep()), sweep_batch, interval=sweep_interval
+            )
+            if artifact_ttl is not None or max_user_bytes is not None
+            else None
+        )
+
+    @contextmanager
+    def lock(
+        self,
+        user_id: str,
+        process_id: str,
+    ) -> Generator[None, None, None]:
+        """Hold the artifact's lock across a read-modify-write of it."""
+        with self._artifact_locks.hold((user_id, process_id)):
+            yield
+
+    def _upload(self, user_id: str, process_id: str, data: bytes) -> None:
+        with stage_timer("artifact_upload"):
+            workspace.online_storage.upload_artifact(user_id, process_id, data)
+
+        self.manifest.mark_uploaded(user_id, process_id, digest=bytes_hash(data))
+
+    def _pending_upload(self, user_id: str, process_id: str) -> bool:
+        if self.upload_queue is None:
+            return False
+
+        # The local payload must also stay until its upload has landed.
+        return any(
+            self.upload_queue.pending_bytes(user_id, upload_id) is not None
+            for upload_id in (process_id, workspace.online_payload_id(process_id))
+        )
+
+    def _try_lock(self, user_id: str, process_id: str) -> AbstractContextManager[bool]:
+        return self._artifact_locks.hold((user_id, process_id), blocking=False)
+
+    def _delete_local(self, user_id: str, process_id: str) -> None:
+        workspace.delete_artifact(self.workspace_dir, user_id, process_id)
+
+    def _evict(self) -> None:
+        self.manifest.evict(
+            self._delete_local,
+            protected=self._pending_upload,
+            try_lock=self._try_lock,
+        )
+
+    def sweep(self) -> list[tuple[str, str]]:
+        """Delete one batch of expired or over-quota local copies.
+
+        Returns:
+            list[tuple[str, str]]: The swept `(user_id, process_id)` pairs.
+        """
+        return self.manifest.sweep(
+            self._delete_local,
+            ttl=self.artifact_ttl,
+            user_max_bytes=self.max_user_bytes,
+            protected=self._pending_upload,
+            try_lock=self._try_lock,
+            limit=self.sweep_batch,
+        )
+
+    def reconcile(self) -> None:
+        """Bring the manifest in line with the artifacts in the workspace.
+
+        Runs at startup, before the sweeper. Entries whose local copy is gone
+        are dropped, and directories and lock files left without a local
+        copy, e.g. by an interrupted deletion, are deleted. Local copies
+        that are missing from the manifest, or may not have been uploaded
+        because the process exited first, are recorded and uploaded again.
+        """
+        for (user_id, process_id), _ in self.manifest.items():
+            if not self.artifact_path(user_id, process_id).exists():
+                self.manifest.remove(user_id, process_id)
+
+        for user_id, process_id in workspace.list_artifacts(self.workspace_dir):
+            with self._try_lock(user_id, process_id) as locked:
+                if locked:
+                    self._reconcile_artifact(user_id, process_id)
+
+        for user_id, process_id in workspace.list_locks(self.workspace_dir):
+            with self._try_lock(user_id, process_id) as locked:
+                path = self.artifact_path(user_id, process_id)
+
+                if locked and not path.parent.exists():
+                    self._delete_local(user_id, process_id)
+
+    def _reconcile_artifact(self, user_id: str, process_id: str) -> None:
+        path = self.artifact_path(user_id, process_id)
+
+        if not path.exists():
+            self._delete_local(user_id, process_id)
+            return
+
+        entry = self.manifest.get(user_id, process_id)
+
+        if entry is not None and entry["uploaded"]:
+            return
+
+        data = path.read_bytes()
+        self.manifest.record(
+            user_id, process_id, len(data), uploaded=False, digest=bytes_hash(data)
+        )
+
+        logger.info(
+            f"Uploading artifact again for user_id: {user_id}, render_id: {process_id}"
+        )
+
+        try:
+            if self.upload_queue is not None:
+                self.upload_queue.submit(user_id, process_id, data)
+            else:
+                self._upload(user_id, process_id, data)
+
+            if (payload := self.read_payload(user_id, process_id)) is not None:
+                self.write_payload(user_id, process_id, payload)
+
+        except Exception as e:
+            logger.error(
+                f"Error uploading artifact for user_id: {user_id}, render_id: {process_id}: {e}"
+            )
+
+    def track_artifact(
+        self,
+        user_id: str,
+        process_id: str,
+        uploaded: bool = False,
+    ) -> None:
+        """Record a local artifact written outside the service in the manifest."""
+        path = self.artifact_path(user_id, process_id)
+        self.manifest.record(
+            user_id, process_id, path.stat().st_size, uploaded=uploaded
+        )
+        self._evict()
+
+    def artifact_path(
+        self,
+        user_id: str,
+        process_id: str,
+    ) -> Path:
+        return workspace.artifact_path(self.workspace_dir, user_id, process_id)
 
     def create_artifact(
         self,
@@ -32,7 +256,14 @@ class WorkspaceService(metaclass=WorkspaceServiceSingletonMeta):
         user_id: str,
         process_id: str,
     ) -> Path:
-        return workspace.get_artifact(self.workspace_dir, user_id, process_id)
+        path = workspace.get_artifact(self.workspace_dir, user_id, process_id)
+
+        if self.manifest.get(user_id, process_id) is None:
+            self.track_artifact(user_id, process_id, uploaded=True)
+        else:
+            self.manifest.touch(user_id, process_id)
+
+        return path
 
     def save_artifact(
         self,
@@ -40,6 +271,168 @@ class WorkspaceService(metaclass=WorkspaceServiceSingletonMeta):
         process_id: str,
         clear_local: bool = False,
     ) -> None:
-        return workspace.save_artifact(
+        workspace.save_artifact(
             self.workspace_dir, user_id, process_id, clear_local=clear_local
         )
+
+        if clear_local:
+            self.manifest.remove(user_id, process_id)
+        else:
+            self.manifest.mark_uploaded(user_id, process_id)
+
+    def read_artifact(
+        self,
+        user_id: str,
+        process_id: str,
+    ) -> bytes:
+        data = workspace.read_artifact(
+            self.workspace_dir, user_id, process_id, upload_queue=self.upload_queue
+        )
+        self.manifest.touch(user_id, process_id)
+
+        return data
+
+    def write_artifact(
+        self,
+        user_id: str,
+        process_id: str,
+        data: bytes,
+    ) -> None:
+        digest = bytes_hash(data)
+
+        # Recorded before the write, so a queued upload that finishes first
+        # finds the entry with this digest to mark.
+        if self.keep_local_copy:
+            self.manifest.record(
+                user_id, process_id, len(data), uploaded=False, digest=digest
+            )
+
+        workspace.write_artifact(
+            self.workspace_dir,
+            user_id,
+            process_id,
+            data,
+            keep_local=self.keep_local_copy,
+            upload_queue=self.upload_queue,
+        )
+
+        if not self.keep_local_copy:
+            self.manifest.remove(user_id, process_id)
+            return
+
+        if self.upload_queue is None:
+            self.manifest.mark_uploaded(user_id, process_id, digest=digest)
+
+        self._evict()
+
+    def upload_outstanding(self, user_id: str, process_id: str) -> bool:
+        """Return whether the artifact's latest bytes may not be online yet.
+
+        That is the case while its upload is queued or failed, and when the
+        manifest records a local copy that was never uploaded, e.g. because
+        the process exited before its upload queue drained.
+        """
+        status = (
+            None
+            if self.upload_queue is None
+            else self.upload_queue.status(user_id, process_id)
+        )
+
+        if status in (UploadStatus.PENDING, UploadStatus.FAILED):
+            return True
+
+        if status is UploadStatus.UPLOADING:
+            return False
+
+        entry = self.manifest.get(user_id, process_id)
+
+        return entry is not None and not entry["uploaded"]
+
+    def upload_status(
+        self,
+        user_id: str,
+        process_id: str,
+    ) -> UploadStatus | None:
+        """Return the status of the artifact's write-behind upload, if any.
+
+        The queue forgets uploads once they land, and the manifest then
+        records them as uploaded.
+        """
+        if self.upload_queue is None:
+            return None
+
+        if (status := self.upload_queue.status(user_id, process_id)) is not None:
+            return status
+
+        entry = self.manifest.get(user_id, process_id)
+
+        return (
+            UploadStatus.UPLOADED if entry is not None and entry["uploaded"] else None
+        )
+
+    def flush_uploads(
+        self,
+        user_id: str | None = None,
+        process_id: str | None = None,
+        timeout: float | None = None,
+    ) -> bool:
+        if self.upload_queue is None:
+            return True
+
+        return self.upload_queue.flush(user_id, process_id, timeout=timeout)
+
+    def close(self, timeout: float | None = None) -> bool:
+        """Stop the sweeper and drain the upload queue.
+
+        Returns:
+            bool: Whether every queued upload landed before the timeout.
+        """
+        if self.sweeper is not None:
+            self.sweeper.close(timeout)
+
+        drained = (
+            True if self.upload_queue is None else self.upload_queue.close(timeout)
+        )
+        self.manifest.save()
+
+        return drained
+
+    def read_metadata(
+        self,
+        user_id: str,
+        process_id: str,
+    ) -> dict[str, Any]:
+        return workspace.read_metadata(self.workspace_dir, user_id, process_id)
+
+    def write_metadata(
+        self,
+        user_id: str,
+        process_id: str,
+        metadata: dict[str, Any],
+    ) -> None:
+        return workspace.write_metadata(
+            self.workspace_dir, user_id, process_id, metadata
+        )
+
+    def read_payload(
+        self,
+        user_id: str,
+        process_id: str,
+    ) -> Payload | None:
+        return workspace.read_payload(
+            self.workspace_dir, user_id, process_id, upload_queue=self.upload_queue
+        )
+
+    def write_payload(
+        self,
+        user_id: str,
+        process_id: str,
+        payload: Payload,
+    ) -> None:
+        return workspace.write_payload(
+            self.workspace_dir,
+            user_id,
+            process_id,
+            payload,
+            upload_queue=self.upload_queue,
+        )
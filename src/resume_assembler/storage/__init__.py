@@ -1,13 +1,35 @@
 from storage.workspace import (
+    artifact_path,
     create_artifact,
     create_workspace,
+    delete_artifact,
     get_artifact,
+    list_artifacts,
+    list_locks,
+    online_payload_id,
+    read_artifact,
+    read_metadata,
+    read_payload,
     save_artifact,
+    write_artifact,
+    write_metadata,
+    write_payload,
 )
 
 __all__ = [
+    "artifact_path",
     "create_artifact",
     "create_workspace",
+    "delete_artifact",
     "get_artifact",
+    "list_artifacts",
+    "list_locks",
+    "online_payload_id",
+    "read_artifact",
+    "read_metadata",
+    "read_payload",
     "save_artifact",
+    "write_artifact",
+    "write_metadata",
+    "write_payload",
 ]
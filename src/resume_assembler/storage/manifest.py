@@ -0,0 +1,694 @@
+from collections.abc import Callable, Generator, Iterable
+from contextlib import AbstractContextManager, contextmanager
+from json import JSONDecodeError, dumps, loads
+from logging import getLogger
+from os import getpid
+from pathlib import Path
+from sqlite3 import Connection, connect
+from threading import RLock, local
+from time import monotonic, time
+from typing import TypedDict
+
+logger = getLogger(__name__)
+
+DEFAULT_SAVE_INTERVAL = 1.0
+DEFAULT_SWEEP_LIMIT = 256
+DEFAULT_BUSY_TIMEOUT = 30.0
+
+
+class ManifestEntry(TypedDict):
+    size: int
+    last_access: float
+    uploaded: bool
+    # SHA-256 of the bytes written locally, or None when they were not hashed.
+    digest: str | None
+
+
+def _entry_key(user_id: str, process_id: str) -> str:
+    return f"{user_id}/{process_id}"
+
+
+def _split_key(key: str) -> tuple[str, str]:
+    user_id, process_id = key.split("/", 1)
+    return user_id, process_id
+
+
+def _unprotected(user_id: str, process_id: str) -> bool:
+    return False
+
+
+@contextmanager
+def _unlocked(user_id: str, process_id: str) -> Generator[bool, None, None]:
+    yield True
+
+
+def _evict_candidates(
+    entries: Iterable[tuple[str, ManifestEntry]],
+    excess: int,
+    protected: Callable[[str, str], bool],
+) -> list[tuple[str, ManifestEntry]]:
+    """Return the uploaded entries, oldest first, that cover `excess` bytes."""
+    candidates: list[tuple[str, ManifestEntry]] = []
+
+    for key, entry in entries:
+        if excess <= 0:
+            break
+
+        if entry["uploaded"] and not protected(*_split_key(key)):
+            candidates.append((key, dict(entry)))
+            excess -= entry["size"]
+
+    return candidates
+
+
+def _sweep_cutoff(ttl: float | None) -> float | None:
+    return None if ttl is None else time() - ttl
+
+
+def _sweep_candidates(
+    entries: Iterable[tuple[str, ManifestEntry]],
+    cutoff: float | None,
+    over_quota: dict[str, int],
+    protected: Callable[[str, str], bool],
+    limit: int,
+) -> list[tuple[str, ManifestEntry]]:
+    """Return the expired or over-quota entries to sweep, oldest first.
+
+    `entries` must be in least recently used order; the scan stops at the
+    first entry that is neither last accessed before `cutoff` nor owned by
+    a user in `over_quota`, which maps users to their bytes over quota and
+    is consumed. Only uploaded entries are swept.
+    """
+    candidates: list[tuple[str, ManifestEntry]] = []
+
+    for key, entry in entries:
+        expired = cutoff is not None and entry["last_access"] <= cutoff
+
+        if len(candidates) >= limit or (not expired and not over_quota):
+            break
+
+        user_id, process_id = _split_key(key)
+
+        if not (expired or user_id in over_quota):
+            continue
+
+        if not entry["uploaded"] or protected(user_id, process_id):
+            continue
+
+        candidates.append((key, dict(entry)))
+
+        if user_id in over_quota:
+            over_quota[user_id] -= entry["size"]
+
+            if over_quota[user_id] <= 0:
+                del over_quota[user_id]
+
+    return candidates
+
+
+def _delete_candidates(
+    manifest: "ArtifactManifest | SharedArtifactManifest",
+    candidates: list[tuple[str, ManifestEntry]],
+    delete: Callable[[str, str], None],
+    protected: Callable[[str, str], bool],
+    try_lock: Callable[[str, str], AbstractContextManager[bool]],
+    action: str,
+) -> list[tuple[str, str]]:
+    """Delete the selected artifacts that are still unchanged and unprotected.
+
+    Runs without the manifest lock, since artifact locks are taken before
+    the manifest's everywhere else. Artifacts whose lock is busy are in use
+    and skipped rather than waited for.
+    """
+    deleted: list[tuple[str, str]] = []
+
+    for key, entry in candidates:
+        user_id, process_id = _split_key(key)
+
+        with try_lock(user_id, process_id) as locked:
+            if (
+                not locked
+                or manifest.get(user_id, process_id) != entry
+                or protected(user_id, process_id)
+            ):
+                continue
+
+            try:
+                delete(user_id, process_id)
+
+            except OSError as e:
+                logger.error(f"Failed to {action} artifact {key}: {e}")
+                continue
+
+            manifest.remove(user_id, process_id)
+
+        deleted.append((user_id, process_id))
+
+    return deleted
+
+
+class ArtifactManifest:
+    """Index of the artifacts held in the local workspace cache tier.
+
+    Each entry records the artifact's size, when it was last accessed and
+    whether its current bytes are durable online. Entries are kept in least
+    recently used order, with per-user byte totals, so eviction and sweeps
+    start from the oldest entry instead of sorting or walking the tree.
+    Artifacts are evicted once the total size exceeds `max_bytes`, and only
+    after they have been uploaded.
+
+    Args:
+        path (Path): The manifest file.
+        max_bytes (int | None): The local byte budget, or `None` for no limit.
+        save_interval (float): The minimum number of seconds between writes
+            of the manifest file.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_bytes: int | None = None,
+        save_interval: float = DEFAULT_SAVE_INTERVAL,
+    ) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.save_interval = save_interval
+        self._set_entries(self._load())
+        self._last_save = monotonic()
+        self._dirty = False
+        self._lock = RLock()
+
+    @property
+    def size(self) -> int:
+        with self._locked():
+            return self._size
+
+    @contextmanager
+    def _locked(self) -> Generator[None, None, None]:
+        with self._lock:
+            yield
+
+    def user_size(self, user_id: str) -> int:
+        with self._locked():
+            return self._user_sizes.get(user_id, 0)
+
+    def _set_entries(self, entries: dict[str, ManifestEntry]) -> None:
+        self._entries: dict[str, ManifestEntry] = dict(
+            sorted(entries.items(), key=lambda item: item[1]["last_access"])
+        )
+        self._size = 0
+        self._user_sizes: dict[str, int] = {}
+
+        for key, entry in self._entries.items():
+            self._account(key, entry["size"])
+
+    def _account(self, key: str, delta: int) -> None:
+        user_id = _split_key(key)[0]
+        self._size += delta
+
+        if user_size := self._user_sizes.get(user_id, 0) + delta:
+            self._user_sizes[user_id] = user_size
+        else:
+            self._user_sizes.pop(user_id, None)
+
+    def _pop(self, key: str) -> ManifestEntry | None:
+        if (entry := self._entries.pop(key, None)) is not None:
+            self._account(key, -entry["size"])
+
+        return entry
+
+    def _load(self) -> dict[str, ManifestEntry]:
+        try:
+            return loads(self.path.read_text(encoding="utf-8"))
+
+        except (FileNotFoundError, JSONDecodeError):
+            return {}
+
+    def save(self) -> None:
+        with self._locked():
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(dumps(self._entries), encoding="utf-8")
+            tmp.replace(self.path)
+            self._last_save = monotonic()
+            self._dirty = False
+
+    def _changed(self) -> None:
+        self._dirty = True
+
+        if monotonic() - self._last_save >= self.save_interval:
+            self.save()
+
+    def get(self, user_id: str, process_id: str) -> ManifestEntry | None:
+        with self._locked():
+            return self._entries.get(_entry_key(user_id, process_id))
+
+    def record(
+        self,
+        user_id: str,
+        process_id: str,
+        size: int,
+        uploaded: bool | None = None,
+        digest: str | None = None,
+    ) -> None:
+        """Record that an artifact was written or read with the given size.
+
+        With `uploaded` left as `None`, the previous upload state is kept
+        only if the artifact's digest did not change.
+        """
+        key = _entry_key(user_id, process_id)
+
+        with self._locked():
+            previous = self._pop(key)
+
+            if uploaded is None:
+                uploaded = (
+                    previous is not None
+                    and previous["uploaded"]
+                    and previous.get("digest") == digest
+                )
+
+            self._entries[key] = {
+                "size": size,
+                "last_access": time(),
+                "uploaded": uploaded,
+                "digest": digest,
+            }
+            self._account(key, size)
+            self._changed()
+
+    def touch(self, user_id: str, process_id: str) -> None:
+        key = _entry_key(user_id, process_id)
+
+        with self._locked():
+            if (entry := self._entries.pop(key, None)) is None:
+                return
+
+            entry["last_access"] = time()
+            self._entries[key] = entry
+            self._changed()
+
+    def mark_uploaded(
+        self,
+        user_id: str,
+        process_id: str,
+        digest: str | None = None,
+    ) -> None:
+        """Mark an artifact's local copy as durable online.
+
+        With `digest`, the entry is only marked when it still records those
+        bytes, so a finished upload of an older version cannot make a newer
+        local copy evictable.
+        """
+        with self._locked():
+            if (entry := self._entries.get(_entry_key(user_id, process_id))) is None:
+                return
+
+            if digest is not None and entry.get("digest") != digest:
+                return
+
+            entry["uploaded"] = True
+            self._changed()
+
+    def remove(self, user_id: str, process_id: str) -> None:
+        with self._locked():
+            if self._pop(_entry_key(user_id, process_id)) is None:
+                return
+
+            self._changed()
+
+    def items(self) -> list[tuple[tuple[str, str], ManifestEntry]]:
+        """Return every `((user_id, process_id), entry)` pair in LRU order."""
+        with self._locked():
+            return [
+                (_split_key(key), dict(entry)) for key, entry in self._entries.items()
+            ]
+
+    def evict(
+        self,
+        delete: Callable[[str, str], None],
+        protected: Callable[[str, str], bool] = _unprotected,
+        try_lock: Callable[[str, str], AbstractContextManager[bool]] = _unlocked,
+    ) -> list[tuple[str, str]]:
+        """Evict uploaded artifacts in LRU order until within the byte budget.
+
+        Args:
+            delete (Callable[[str, str], None]): Deletes an artifact's local copy.
+            protected (Callable[[str, str], bool]): Returns `True` for artifacts
+                that must be kept even though they are marked as uploaded.
+            try_lock (Callable[[str, str], AbstractContextManager[bool]]): Holds
+                an artifact's lock without waiting, yielding whether it did.
+        Returns:
+            list[tuple[str, str]]: The evicted `(user_id, process_id)` pairs.
+        """
+        with self._locked():
+            if self.max_bytes is None or self._size <= self.max_bytes:
+                return []
+
+            candidates = _evict_candidates(
+                self._entries.items(), self._size - self.max_bytes, protected
+            )
+
+        return self._delete(candidates, delete, protected, try_lock, "evict")
+
+    def sweep(
+        self,
+        delete: Callable[[str, str], None],
+        ttl: float | None = None,
+        user_max_bytes: int | None = None,
+        protected: Callable[[str, str], bool] = _unprotected,
+        try_lock: Callable[[str, str], AbstractContextManager[bool]] = _unlocked,
+        limit: int = DEFAULT_SWEEP_LIMIT,
+    ) -> list[tuple[str, str]]:
+        """Delete local copies that expired or exceed a user quota.
+
+        The scan starts at the least recently used entry and stops at the
+        first entry that is neither expired nor owned by a user over quota,
+        and at most `limit` artifacts are deleted, so each call does a small,
+        bounded amount of work.
+
+        Args:
+            delete (Callable[[str, str], None]): Deletes an artifact's local copy.
+            ttl (float | None): Seconds since last access after which a local
+                copy expires, or `None` to keep copies regardless of age.
+            user_max_bytes (int | None): The local bytes allowed per user, or
+                `None` for no quota.
+            protected (Callable[[str, str], bool]): Returns `True` for artifacts
+                that must be kept even though they are marked as uploaded.
+            try_lock (Callable[[str, str], AbstractContextManager[bool]]): Holds
+                an artifact's lock without waiting, yielding whether it did.
+            limit (int): The maximum number of artifacts deleted by this call.
+        Returns:
+            list[tuple[str, str]]: The deleted `(user_id, process_id)` pairs.
+        """
+        cutoff = _sweep_cutoff(ttl)
+
+        with self._locked():
+            over_quota = (
+                {}
+                if user_max_bytes is None
+                else {
+                    user_id: size - user_max_bytes
+                    for user_id, size in self._user_sizes.items()
+                    if size > user_max_bytes
+                }
+            )
+
+            if cutoff is None and not over_quota:
+                return []
+
+            candidates = _sweep_candidates(
+                self._entries.items(), cutoff, over_quota, protected, limit
+            )
+
+        return self._delete(candidates, delete, protected, try_lock, "sweep")
+
+    def _delete(
+        self,
+        candidates: list[tuple[str, ManifestEntry]],
+        delete: Callable[[str, str], None],
+        protected: Callable[[str, str], bool],
+        try_lock: Callable[[str, str], AbstractContextManager[bool]],
+        action: str,
+    ) -> list[tuple[str, str]]:
+        deleted = _delete_candidates(
+            self, candidates, delete, protected, try_lock, action
+        )
+
+        if deleted:
+            self.save()
+
+        return deleted
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL,
+    uploaded INTEGER NOT NULL,
+    digest TEXT
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+CREATE TABLE IF NOT EXISTS user_sizes (
+    user_id TEXT PRIMARY KEY,
+    size INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS user_sizes_size ON user_sizes (size);
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    INSERT OR IGNORE INTO user_sizes VALUES (new.user_id, 0);
+    UPDATE user_sizes SET size = size + new.size WHERE user_id = new.user_id;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size ON entries BEGIN
+    UPDATE user_sizes SET size = size - old.size + new.size
+    WHERE user_id = new.user_id;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+    UPDATE user_sizes SET size = size - old.size WHERE user_id = old.user_id;
+    DELETE FROM user_sizes WHERE user_id = old.user_id AND size <= 0;
+END;
+"""
+
+# Keeps the previous upload state when `uploaded` is NULL and the digest is
+# unchanged, like `ArtifactManifest.record`.
+_RECORD = """
+INSERT INTO entries VALUES (:key, :user_id, :size, :last_access, :uploaded, :digest)
+ON CONFLICT (key) DO UPDATE SET
+    size = excluded.size,
+    last_access = excluded.last_access,
+    uploaded = CASE
+        WHEN :keep THEN uploaded AND digest IS excluded.digest
+        ELSE excluded.uploaded
+    END,
+    digest = excluded.digest
+"""
+
+_ENTRY_COLUMNS = "key, size, last_access, uploaded, digest"
+
+
+def _row_entry(row: tuple) -> tuple[str, ManifestEntry]:
+    key, size, last_access, uploaded, digest = row
+
+    return key, {
+        "size": size,
+        "last_access": last_access,
+        "uploaded": bool(uploaded),
+        "digest": digest,
+    }
+
+
+class SharedArtifactManifest:
+    """An `ArtifactManifest` shared by every process serving one workspace.
+
+    Entries live in a SQLite database in WAL mode, so each access is a small
+    indexed transaction: readers never block, writers only serialize on the
+    rows they commit, and nothing is rewritten as a whole. The user byte
+    totals are kept up to date by triggers. Every thread of every process
+    opens its own connection.
+
+    Args:
+        path (Path): The manifest database.
+        max_bytes (int | None): The local byte budget, or `None` for no limit.
+        busy_timeout (float): Seconds to wait for another writer's lock.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_bytes: int | None = None,
+        busy_timeout: float = DEFAULT_BUSY_TIMEOUT,
+    ) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.busy_timeout = busy_timeout
+        self._local = local()
+
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> Connection:
+        # Connections are per thread and are not reused across fork.
+        if getattr(self._local, "pid", None) != getpid():
+            db = connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA synchronous = NORMAL")
+            self._local.connection = db
+            self._local.pid = getpid()
+
+        return self._local.connection
+
+    @contextmanager
+    def _transaction(self) -> Generator[Connection, None, None]:
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+
+        try:
+            yield db
+
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+        db.execute("COMMIT")
+
+    def _entries(
+        self,
+        where: str = "",
+        parameters: tuple = (),
+    ) -> Generator[tuple[str, ManifestEntry], None, None]:
+        rows = self._connection().execute(
+            f"SELECT {_ENTRY_COLUMNS} FROM entries {where} ORDER BY last_access",
+            parameters,
+        )
+
+        # Closed as soon as the caller stops reading, which ends the read.
+        try:
+            for row in rows:
+                yield _row_entry(row)
+        finally:
+            rows.close()
+
+    @property
+    def size(self) -> int:
+        query = "SELECT COALESCE(SUM(size), 0) FROM user_sizes"
+        return self._connection().execute(query).fetchone()[0]
+
+    def user_size(self, user_id: str) -> int:
+        row = (
+            self._connection()
+            .execute("SELECT size FROM user_sizes WHERE user_id = ?", (user_id,))
+            .fetchone()
+        )
+
+        return 0 if row is None else row[0]
+
+    def save(self) -> None:
+        """Changes are committed as they are made; kept for interface parity."""
+
+    def get(self, user_id: str, process_id: str) -> ManifestEntry | None:
+        row = (
+            self._connection()
+            .execute(
+                f"SELECT {_ENTRY_COLUMNS} FROM entries WHERE key = ?",
+                (_entry_key(user_id, process_id),),
+            )
+            .fetchone()
+        )
+
+        return None if row is None else _row_entry(row)[1]
+
+    def record(
+        self,
+        user_id: str,
+        process_id: str,
+        size: int,
+        uploaded: bool | None = None,
+        digest: str | None = None,
+    ) -> None:
+        with self._transaction() as db:
+            db.execute(
+                _RECORD,
+                {
+                    "key": _entry_key(user_id, process_id),
+                    "user_id": user_id,
+                    "size": size,
+                    "last_access": time(),
+                    "uploaded": bool(uploaded),
+                    "digest": digest,
+                    "keep": uploaded is None,
+                },
+            )
+
+    def touch(self, user_id: str, process_id: str) -> None:
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE entries SET last_access = ? WHERE key = ?",
+                (time(), _entry_key(user_id, process_id)),
+            )
+
+    def mark_uploaded(
+        self,
+        user_id: str,
+        process_id: str,
+        digest: str | None = None,
+    ) -> None:
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE entries SET uploaded = 1 WHERE key = ? AND (? IS NULL OR digest IS ?)",
+                (_entry_key(user_id, process_id), digest, digest),
+            )
+
+    def remove(self, user_id: str, process_id: str) -> None:
+        with self._transaction() as db:
+            db.execute(
+                "DELETE FROM entries WHERE key = ?", (_entry_key(user_id, process_id),)
+            )
+
+    def items(self) -> list[tuple[tuple[str, str], ManifestEntry]]:
+        return [(_split_key(key), entry) for key, entry in self._entries()]
+
+    def evict(
+        self,
+        delete: Callable[[str, str], None],
+        protected: Callable[[str, str], bool] = _unprotected,
+        try_lock: Callable[[str, str], AbstractContextManager[bool]] = _unlocked,
+    ) -> list[tuple[str, str]]:
+        if self.max_bytes is None or (excess := self.size - self.max_bytes) <= 0:
+            return []
+
+        candidates = _evict_candidates(
+            self._entries("WHERE uploaded"), excess, protected
+        )
+
+        return _delete_candidates(
+            self, candidates, delete, protected, try_lock, "evict"
+        )
+
+    def sweep(
+        self,
+        delete: Callable[[str, str], None],
+        ttl: float | None = None,
+        user_max_bytes: int | None = None,
+        protected: Callable[[str, str], bool] = _unprotected,
+        try_lock: Callable[[str, str], AbstractContextManager[bool]] = _unlocked,
+        limit: int = DEFAULT_SWEEP_LIMIT,
+    ) -> list[tuple[str, str]]:
+        """Delete local copies that expired or exceed a user quota.
+
+        Like `ArtifactManifest.sweep`, but only the users over quota and the
+        entries that may be swept are read from the database.
+        """
+        cutoff = _sweep_cutoff(ttl)
+        over_quota: dict[str, int] = {}
+
+        if user_max_bytes is not None:
+            over_quota = dict(
+                self._connection().execute(
+                    "SELECT user_id, size - ? FROM user_sizes WHERE size > ?",
+                    (user_max_bytes, user_max_bytes),
+                )
+            )
+
+        if cutoff is None and not over_quota:
+            return []
+
+        conditions: list[str] = []
+        parameters: list[float] = []
+
+        if cutoff is not None:
+            conditions.append("last_access <= ?")
+            parameters.append(cutoff)
+
+        if over_quota:
+            conditions.append(
+                "user_id IN (SELECT user_id FROM user_sizes WHERE size > ?)"
+            )
+            parameters.append(user_max_bytes)
+
+        entries = self._entries(
+            f"WHERE uploaded AND ({' OR '.join(conditions)})", tuple(parameters)
+        )
+        candidates = _sweep_candidates(entries, cutoff, over_quota, protected, limit)
+
+        return _delete_candidates(
+            self, candidates, delete, protected, try_lock, "sweep"
+        )
@@ -1,4 +1,8 @@
 from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from typing import BinaryIO
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
 
 
 class OnlineStorage(ABC):
@@ -10,3 +14,41 @@ class OnlineStorage(ABC):
 
     @abstractmethod
     def artifact_exists(self, user_id: str, process_id: str) -> bool: ...
+
+    def upload_artifact_stream(
+        self,
+        user_id: str,
+        process_id: str,
+        stream: BinaryIO,
+    ) -> None:
+        """Upload an artifact from a file-like object.
+
+        The default reads the whole stream and delegates to `upload_artifact`.
+        Backends that can upload incrementally should override it.
+        """
+        self.upload_artifact(user_id, process_id, stream.read())
+
+    def download_artifact_stream(
+        self,
+        user_id: str,
+        process_id: str,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> Iterator[bytes]:
+        """Download an artifact as an iterator of byte chunks.
+
+        The default slices the result of `download_artifact`. Backends that
+        can download incrementally should override it.
+        """
+        data = memoryview(self.download_artifact(user_id, process_id))
+
+        for start in range(0, len(data), chunk_size):
+            yield bytes(data[start : start + chunk_size])
+
+    def close(self) -> None:
+        """Release any clients or connections held by the backend."""
+
+    def __enter__(self) -> "OnlineStorage":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
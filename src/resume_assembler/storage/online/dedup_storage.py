@@ -0,0 +1,160 @@
+from collections import OrderedDict
+from json import dumps, loads
+from threading import Lock
+from typing import TypedDict
+
+from storage.online.blob_storage import OnlineStorage
+from utils.hashing import bytes_hash
+from utils.zip_writer import ZipEntry, read_entries, write_zip
+
+# Parts are stored in the wrapped backend under this reserved user id, with
+# their content digest as the process id.
+PARTS_USER_ID = ".parts"
+MANIFEST_MAGIC = b"resume-parts/1\n"
+
+DEFAULT_CACHE_MAX_BYTES = 32 * 1024 * 1024
+DEFAULT_MAX_KNOWN_PARTS = 65536
+
+
+class PartRef(TypedDict):
+    name: str
+    method: int
+    crc: int
+    size: int
+    digest: str
+
+
+class DeduplicatingStorage(OnlineStorage):
+    """OnlineStorage wrapper that stores packages as content-addressed parts.
+
+    An uploaded package is split into its zip members. Each member's
+    compressed bytes are stored once under their digest, and the artifact
+    itself only holds a small manifest listing the members in order. Parts
+    shared between artifacts, such as styles, theme and font tables, are
+    therefore uploaded and stored once across all users. Downloads fetch
+    the manifest and reassemble the package, serving hot parts from a
+    size-bounded in-memory cache.
+
+    Artifacts that are not zip packages are stored whole, and artifacts
+    stored whole before the wrapper was enabled are still downloaded as is.
+    Parts are never deleted, since no artifact deletion reaches the backend.
+
+    Args:
+        storage (OnlineStorage): The wrapped backend.
+        cache_max_bytes (int): The total size of cached parts before the
+            least recently used ones are evicted.
+        max_known_parts (int): The number of part digests remembered as
+            already stored, which skips their existence checks.
+    """
+
+    def __init__(
+        self,
+        storage: OnlineStorage,
+        cache_max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+        max_known_parts: int = DEFAULT_MAX_KNOWN_PARTS,
+    ) -> None:
+        if cache_max_bytes < 0:
+            raise ValueError("Part cache size cannot be negative.")
+
+        self.storage = storage
+        self.cache_max_bytes = cache_max_bytes
+        self.max_known_parts = max_known_parts
+        self._cache: OrderedDict[str, bytes] = OrderedDict()
+        self._cache_size = 0
+        self._known: OrderedDict[str, None] = OrderedDict()
+        self._lock = Lock()
+
+    def _cached(self, digest: str) -> bytes | None:
+        with self._lock:
+            if (data := self._cache.get(digest)) is not None:
+                self._cache.move_to_end(digest)
+
+            return data
+
+    def _remember(self, digest: str, data: bytes | None = None) -> None:
+        with self._lock:
+            self._known[digest] = None
+            self._known.move_to_end(digest)
+
+            while len(self._known) > self.max_known_parts:
+                self._known.popitem(last=False)
+
+            if data is None or len(data) > self.cache_max_bytes:
+                return
+
+            if (previous := self._cache.pop(digest, None)) is not None:
+                self._cache_size -= len(previous)
+
+            self._cache[digest] = data
+            self._cache_size += len(data)
+
+            while self._cache_size > self.cache_max_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_size -= len(evicted)
+
+    def _is_stored(self, digest: str) -> bool:
+        with self._lock:
+            if digest in self._known:
+                self._known.move_to_end(digest)
+                return True
+
+        return self.storage.artifact_exists(PARTS_USER_ID, digest)
+
+    def _upload_part(self, entry: ZipEntry) -> PartRef:
+        digest = bytes_hash(entry.data)
+
+        if not self._is_stored(digest):
+            self.storage.upload_artifact(PARTS_USER_ID, digest, entry.data)
+
+        self._remember(digest, entry.data)
+
+        return {
+            "name": entry.name,
+            "method": entry.method,
+            "crc": entry.crc,
+            "size": entry.size,
+            "digest": digest,
+        }
+
+    def _download_part(self, ref: PartRef) -> ZipEntry:
+        digest = ref["digest"]
+
+        if (data := self._cached(digest)) is None:
+            data = self.storage.download_artifact(PARTS_USER_ID, digest)
+
+            if bytes_hash(data) != digest:
+                raise ValueError(f"Stored part {digest} does not match its digest.")
+
+            self._remember(digest, data)
+
+        return ZipEntry(ref["name"], ref["method"], ref["crc"], ref["size"], data)
+
+    def upload_artifact(self, user_id: str, process_id: str, data: bytes) -> None:
+        try:
+            entries = read_entries(data)
+
+        except ValueError:
+            self.storage.upload_artifact(user_id, process_id, data)
+            return
+
+        # Parts go first, so a stored manifest never references a missing part.
+        parts = [self._upload_part(entry) for entry in entries.values()]
+        manifest = MANIFEST_MAGIC + dumps(parts, separators=(",", ":")).encode("utf-8")
+
+        self.storage.upload_artifact(user_id, process_id, manifest)
+
+    def download_artifact(self, user_id: str, process_id: str) -> bytes:
+        data = self.storage.download_artifact(user_id, process_id)
+
+        if not data.startswith(MANIFEST_MAGIC):
+            return data
+
+        parts: list[PartRef] = loads(data[len(MANIFEST_MAGIC) :])
+
+        return write_zip([self._download_part(ref) for ref in parts])
+
+    def artifact_exists(self, user_id: str, process_id: str) -> bool:
+        return self.storage.artifact_exists(user_id, process_id)
+
+    def close(self) -> None:
+        self.storage.close()
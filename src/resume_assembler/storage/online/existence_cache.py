@@ -0,0 +1,110 @@
+from collections import OrderedDict
+from collections.abc import Iterator
+from threading import Lock
+from time import monotonic
+from typing import BinaryIO
+
+from storage.online.blob_storage import DEFAULT_CHUNK_SIZE, OnlineStorage
+
+DEFAULT_POSITIVE_TTL = 300.0
+DEFAULT_NEGATIVE_TTL = 5.0
+DEFAULT_MAX_ENTRIES = 65536
+
+
+class ExistenceCachingStorage(OnlineStorage):
+    """OnlineStorage wrapper that caches `artifact_exists` answers.
+
+    Positive and negative answers expire after their own TTLs. Uploads and
+    successful downloads prove that an artifact exists, so they refresh the
+    cache without a remote call. At most `max_entries` answers are kept,
+    and the least recently used ones are dropped first.
+
+    Args:
+        storage (OnlineStorage): The wrapped backend.
+        positive_ttl (float): Seconds to trust an "exists" answer.
+        negative_ttl (float): Seconds to trust a "does not exist" answer.
+        max_entries (int): The number of answers to keep.
+    """
+
+    def __init__(
+        self,
+        storage: OnlineStorage,
+        positive_ttl: float = DEFAULT_POSITIVE_TTL,
+        negative_ttl: float = DEFAULT_NEGATIVE_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ) -> None:
+        if max_entries < 1:
+            raise ValueError("Existence cache must keep at least one entry.")
+
+        self.storage = storage
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, str], tuple[bool, float]] = OrderedDict()
+        self._lock = Lock()
+
+    def _remember(self, user_id: str, process_id: str, exists: bool) -> None:
+        ttl = self.positive_ttl if exists else self.negative_ttl
+
+        key = (user_id, process_id)
+
+        with self._lock:
+            self._entries[key] = (exists, monotonic() + ttl)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str, process_id: str) -> None:
+        with self._lock:
+            self._entries.pop((user_id, process_id), None)
+
+    def upload_artifact(self, user_id: str, process_id: str, data: bytes) -> None:
+        self.storage.upload_artifact(user_id, process_id, data)
+        self._remember(user_id, process_id, True)
+
+    def download_artifact(self, user_id: str, process_id: str) -> bytes:
+        data = self.storage.download_artifact(user_id, process_id)
+        self._remember(user_id, process_id, True)
+
+        return data
+
+    def upload_artifact_stream(
+        self,
+        user_id: str,
+        process_id: str,
+        stream: BinaryIO,
+    ) -> None:
+        self.storage.upload_artifact_stream(user_id, process_id, stream)
+        self._remember(user_id, process_id, True)
+
+    def download_artifact_stream(
+        self,
+        user_id: str,
+        process_id: str,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> Iterator[bytes]:
+        yield from self.storage.download_artifact_stream(
+            user_id, process_id, chunk_size
+        )
+        self._remember(user_id, process_id, True)
+
+    def artifact_exists(self, user_id: str, process_id: str) -> bool:
+        key = (user_id, process_id)
+
+        with self._lock:
+            cached = self._entries.get(key)
+
+            if cached is not None and cached[1] > monotonic():
+                self._entries.move_to_end(key)
+                return cached[0]
+
+            self._entries.pop(key, None)
+
+        exists = self.storage.artifact_exists(user_id, process_id)
+        self._remember(user_id, process_id, exists)
+
+        return exists
+
+    def close(self) -> None:
+        self.storage.close()
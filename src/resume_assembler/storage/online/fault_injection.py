@@ -0,0 +1,95 @@
+from collections.abc import Iterator
+from random import Random
+from threading import Lock
+from time import sleep
+from typing import BinaryIO
+
+from storage.online.blob_storage import DEFAULT_CHUNK_SIZE, OnlineStorage
+
+
+class FaultInjectingStorage(OnlineStorage):
+    """OnlineStorage wrapper that adds latency and random failures.
+
+    Intended for exercising retry, timeout and concurrency handling against
+    a local backend such as `LocalOnlineStorage`.
+
+    Args:
+        storage (OnlineStorage): The wrapped backend.
+        latency (float): Seconds added before every call.
+        jitter (float): Up to this many extra seconds added at random.
+        failure_rate (float): The probability that a call raises `error`.
+        error (type[Exception]): The exception raised for injected faults.
+        seed (int | None): Seed for reproducible fault sequences.
+    """
+
+    def __init__(
+        self,
+        storage: OnlineStorage,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        error: type[Exception] = ConnectionError,
+        seed: int | None = None,
+    ) -> None:
+        if not 0.0 <= failure_rate <= 1.0:
+            raise ValueError("Failure rate must be between 0 and 1.")
+
+        self.storage = storage
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.error = error
+        self.calls = 0
+        self.faults = 0
+        self._random = Random(seed)
+        self._lock = Lock()
+
+    def _inject(self, operation: str) -> None:
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            fail = self._random.random() < self.failure_rate
+
+            if fail:
+                self.faults += 1
+
+        if delay:
+            sleep(delay)
+
+        if fail:
+            raise self.error(f"Injected fault during {operation}")
+
+    def upload_artifact(self, user_id: str, process_id: str, data: bytes) -> None:
+        self._inject("upload")
+        self.storage.upload_artifact(user_id, process_id, data)
+
+    def download_artifact(self, user_id: str, process_id: str) -> bytes:
+        self._inject("download")
+        return self.storage.download_artifact(user_id, process_id)
+
+    def artifact_exists(self, user_id: str, process_id: str) -> bool:
+        self._inject("exists")
+        return self.storage.artifact_exists(user_id, process_id)
+
+    def upload_artifact_stream(
+        self,
+        user_id: str,
+        process_id: str,
+        stream: BinaryIO,
+    ) -> None:
+        self._inject("upload")
+        self.storage.upload_artifact_stream(user_id, process_id, stream)
+
+    def download_artifact_stream(
+        self,
+        user_id: str,
+        process_id: str,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> Iterator[bytes]:
+        self._inject("download")
+        yield from self.storage.download_artifact_stream(
+            user_id, process_id, chunk_size
+        )
+
+    def close(self) -> None:
+        self.storage.close()
@@ -0,0 +1,75 @@
+from collections.abc import Callable, Iterator
+from os import getpid
+from pathlib import Path
+from shutil import copyfileobj
+from threading import get_ident
+from typing import BinaryIO
+
+from storage.online.blob_storage import DEFAULT_CHUNK_SIZE, OnlineStorage
+
+BLOB_SUFFIX = ".docx"
+
+
+class LocalOnlineStorage(OnlineStorage):
+    """OnlineStorage backed by a directory on the local filesystem.
+
+    Serves as the reference backend and as a stand-in for the blob store in
+    tests and local development. Uploads are written to a temporary file and
+    renamed into place, so readers never observe a partial artifact.
+
+    Args:
+        root (Path | str): The directory that holds the stored artifacts.
+    """
+
+    def __init__(self, root: Path | str) -> None:
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _blob_path(self, user_id: str, process_id: str) -> Path:
+        return self.root / user_id / f"{process_id}{BLOB_SUFFIX}"
+
+    def _write(
+        self, user_id: str, process_id: str, write: Callable[[BinaryIO], object]
+    ) -> None:
+        path = self._blob_path(user_id, process_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{getpid()}.{get_ident()}.tmp")
+
+        try:
+            with open(tmp, "wb") as f:
+                write(f)
+            tmp.replace(path)
+
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def upload_artifact(self, user_id: str, process_id: str, data: bytes) -> None:
+        self._write(user_id, process_id, lambda f: f.write(data))
+
+    def upload_artifact_stream(
+        self,
+        user_id: str,
+        process_id: str,
+        stream: BinaryIO,
+    ) -> None:
+        self._write(
+            user_id,
+            process_id,
+            lambda f: copyfileobj(stream, f, DEFAULT_CHUNK_SIZE),
+        )
+
+    def download_artifact(self, user_id: str, process_id: str) -> bytes:
+        return self._blob_path(user_id, process_id).read_bytes()
+
+    def download_artifact_stream(
+        self,
+        user_id: str,
+        process_id: str,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> Iterator[bytes]:
+        with open(self._blob_path(user_id, process_id), "rb") as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+    def artifact_exists(self, user_id: str, process_id: str) -> bool:
+        return self._blob_path(user_id, process_id).is_file()
@@ -0,0 +1,256 @@
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from logging import getLogger
+from random import uniform
+from shutil import copyfileobj
+from tempfile import SpooledTemporaryFile
+from threading import BoundedSemaphore, Lock
+from time import sleep
+from typing import BinaryIO, TypeVar
+
+from storage.online.blob_storage import DEFAULT_CHUNK_SIZE, OnlineStorage
+from utils.concurrency import after_fork_in_child
+
+logger = getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_BASE_DELAY = 0.1
+DEFAULT_MAX_DELAY = 2.0
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_RETRY_ON: tuple[type[BaseException], ...] = (ConnectionError, TimeoutError)
+# Bytes of a non-seekable upload stream kept in memory before spilling to disk.
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+
+class ResilientOnlineStorage(OnlineStorage):
+    """OnlineStorage wrapper that bounds concurrency and retries failures.
+
+    At most `max_concurrency` calls reach the wrapped backend at once; excess
+    callers wait for a slot. Calls that raise one of `retry_on` are retried
+    with full-jitter exponential backoff, and each call except a streamed
+    download is abandoned with a `TimeoutError` after `timeout` seconds. A timed-out
+    attempt keeps running in the background, so it is not retried, and a
+    later upload of the same artifact first waits for it. Calls run on a
+    worker pool owned by the wrapper, which is shared by every caller and
+    released, together with the backend, by `close`.
+
+    Args:
+        storage (OnlineStorage): The wrapped backend.
+        max_concurrency (int): The maximum number of in-flight backend calls.
+        max_attempts (int): The maximum number of attempts per operation.
+        base_delay (float): The backoff ceiling for the first retry, in seconds.
+        max_delay (float): The largest backoff ceiling, in seconds.
+        timeout (float | None): The per-attempt timeout, or `None` for none.
+        retry_on (tuple[type[BaseException], ...]): The errors that are retried.
+    """
+
+    def __init__(
+        self,
+        storage: OnlineStorage,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        base_delay: float = DEFAULT_BASE_DELAY,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        timeout: float | None = DEFAULT_TIMEOUT,
+        retry_on: tuple[type[BaseException], ...] = DEFAULT_RETRY_ON,
+    ) -> None:
+        if max_concurrency < 1:
+            raise ValueError("Concurrency limit must be at least 1.")
+
+        if max_attempts < 1:
+            raise ValueError("At least one attempt is required.")
+
+        self.storage = storage
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.retry_on = retry_on
+        self.max_concurrency = max_concurrency
+        self._start_pool()
+        after_fork_in_child(self._start_pool)
+
+    def _start_pool(self) -> None:
+        # Also run in forked children, whose copy of the pool has no threads.
+        self._slots = BoundedSemaphore(self.max_concurrency)
+        self._lock = Lock()
+        self._uploads: dict[tuple[str, str], Future] = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency, thread_name_prefix="online-storage"
+        )
+
+    def _backoff(self, attempt: int) -> float:
+        return uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    def _submit(self, call: Callable[[], T]) -> Future[T]:
+        self._slots.acquire()
+
+        try:
+            future = self._executor.submit(call)
+
+        except BaseException:
+            self._slots.release()
+            raise
+
+        # The slot is held until the backend call really finishes, even when
+        # the caller gives up on it, so timeouts cannot exceed the limit.
+        future.add_done_callback(lambda _: self._slots.release())
+
+        return future
+
+    def _timed_out(self, operation: str) -> TimeoutError:
+        return TimeoutError(
+            f"Online storage {operation} timed out after {self.timeout} seconds"
+        )
+
+    def _retry_delay(self, operation: str, attempt: int, error: BaseException) -> float:
+        if attempt >= self.max_attempts:
+            raise error
+
+        delay = self._backoff(attempt - 1)
+        logger.warning(
+            f"Online storage {operation} failed on attempt {attempt}, retrying in {delay:.2f}s: {error}"
+        )
+
+        return delay
+
+    def _call(
+        self,
+        operation: str,
+        call: Callable[[], T],
+        key: tuple[str, str] | None = None,
+    ) -> T:
+        """Run `call` on the pool, retrying it after retryable errors.
+
+        An attempt that times out may still be running, and retrying then
+        would race it, so the timeout is raised without a retry. With `key`,
+        the call also waits for an earlier timed-out upload of that artifact
+        to finish first, so a stale attempt cannot land after a newer one.
+        """
+        attempt = 0
+
+        while True:
+            attempt += 1
+
+            if key is not None:
+                self._await_previous(operation, key)
+
+            future = self._submit(call)
+
+            if key is not None:
+                with self._lock:
+                    self._uploads[key] = future
+
+                future.add_done_callback(lambda f: self._forget(key, f))
+
+            if not wait([future], timeout=self.timeout).done:
+                raise self._timed_out(operation)
+
+            try:
+                return future.result()
+
+            except self.retry_on as e:
+                sleep(self._retry_delay(operation, attempt, e))
+
+    def _await_previous(self, operation: str, key: tuple[str, str]) -> None:
+        with self._lock:
+            previous = self._uploads.get(key)
+
+        if previous is not None and not wait([previous], timeout=self.timeout).done:
+            raise self._timed_out(operation)
+
+    def _forget(self, key: tuple[str, str], future: Future) -> None:
+        with self._lock:
+            if self._uploads.get(key) is future:
+                del self._uploads[key]
+
+    def upload_artifact(self, user_id: str, process_id: str, data: bytes) -> None:
+        self._call(
+            "upload",
+            lambda: self.storage.upload_artifact(user_id, process_id, data),
+            key=(user_id, process_id),
+        )
+
+    def download_artifact(self, user_id: str, process_id: str) -> bytes:
+        return self._call(
+            "download",
+            lambda: self.storage.download_artifact(user_id, process_id),
+        )
+
+    def artifact_exists(self, user_id: str, process_id: str) -> bool:
+        return self._call(
+            "exists",
+            lambda: self.storage.artifact_exists(user_id, process_id),
+        )
+
+    def upload_artifact_stream(
+        self,
+        user_id: str,
+        process_id: str,
+        stream: BinaryIO,
+    ) -> None:
+        """Upload from a stream, rewinding it to its start before each attempt.
+
+        A stream that cannot seek is first spooled to a temporary file, kept
+        in memory up to `SPOOL_MAX_SIZE` bytes, so that it can be replayed.
+        """
+        if not stream.seekable():
+            with SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as spool:
+                copyfileobj(stream, spool)
+                spool.seek(0)
+
+                return self.upload_artifact_stream(user_id, process_id, spool)
+
+        start = stream.tell()
+
+        # Attempts never share the stream: a retry only starts after the
+        # previous attempt failed, and a timed-out attempt is not retried.
+        def attempt() -> None:
+            stream.seek(start)
+            self.storage.upload_artifact_stream(user_id, process_id, stream)
+
+        self._call("upload", attempt, key=(user_id, process_id))
+
+    def download_artifact_stream(
+        self,
+        user_id: str,
+        process_id: str,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> Iterator[bytes]:
+        """Download as chunks, retrying until the first chunk has arrived.
+
+        Once data has been handed to the caller a failure can no longer be
+        retried transparently and is raised instead. The concurrency slot is
+        held for the whole download; timeouts do not apply.
+        """
+        attempt = 0
+
+        while True:
+            attempt += 1
+
+            with self._slots:
+                try:
+                    chunks = iter(
+                        self.storage.download_artifact_stream(
+                            user_id, process_id, chunk_size
+                        )
+                    )
+                    first = next(chunks, None)
+
+                except self.retry_on as e:
+                    delay = self._retry_delay("download", attempt, e)
+
+                else:
+                    if first is not None:
+                        yield first
+                        yield from chunks
+                    return
+
+            sleep(delay)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self.storage.close()
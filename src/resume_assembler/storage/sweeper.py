@@ -0,0 +1,73 @@
+from collections.abc import Callable
+from logging import getLogger
+from threading import Event, Thread
+
+from utils.concurrency import after_fork_in_child
+
+logger = getLogger(__name__)
+
+DEFAULT_SWEEP_INTERVAL = 60.0
+
+
+class WorkspaceSweeper:
+    """Background thread that periodically sweeps the local workspace.
+
+    Each pass calls `sweep`, which deletes a bounded batch of local copies
+    and returns how many it deleted. A full batch means more work is likely
+    waiting, so the next pass runs immediately instead of after `interval`.
+
+    Args:
+        sweep (Callable[[], int]): Runs one sweep pass and returns the number
+            of artifacts it deleted.
+        batch_size (int): The number of deletions in a full pass.
+        interval (float): Seconds to wait between passes that were not full.
+    """
+
+    def __init__(
+        self,
+        sweep: Callable[[], int],
+        batch_size: int,
+        interval: float = DEFAULT_SWEEP_INTERVAL,
+    ) -> None:
+        if interval <= 0:
+            raise ValueError("Sweep interval must be positive.")
+
+        self._sweep = sweep
+        self._batch_size = batch_size
+        self._interval = interval
+        self._closed = False
+        self._stopped = Event()
+        self._start_worker()
+        after_fork_in_child(self._after_fork)
+
+    def _start_worker(self) -> None:
+        self._worker = Thread(target=self._run, name="workspace-sweeper", daemon=True)
+        self._worker.start()
+
+    def _after_fork(self) -> None:
+        self._stopped = Event()
+
+        if not self._closed:
+            self._start_worker()
+
+    def _run(self) -> None:
+        stopped = self._stopped
+        delay = self._interval
+
+        while not stopped.wait(delay):
+            try:
+                swept = self._sweep()
+
+            except Exception as e:
+                logger.error(f"Workspace sweep failed: {e}")
+                swept = 0
+
+            if swept:
+                logger.info(f"Swept {swept} local artifacts from the workspace")
+
+            delay = 0 if swept >= self._batch_size else self._interval
+
+    def close(self, timeout: float | None = None) -> None:
+        self._closed = True
+        self._stopped.set()
+        self._worker.join(timeout)
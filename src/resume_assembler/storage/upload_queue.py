@@ -0,0 +1,290 @@
+from collections import OrderedDict
+from collections.abc import Callable
+from enum import Enum
+from logging import getLogger
+from threading import Condition, Thread
+from time import monotonic
+
+from utils.concurrency import after_fork_in_child
+
+logger = getLogger(__name__)
+
+DEFAULT_MAX_PENDING = 64
+DEFAULT_RETRY_BASE_DELAY = 1.0
+DEFAULT_RETRY_MAX_DELAY = 60.0
+DEFAULT_MAX_ATTEMPTS = 10
+DEFAULT_MAX_FAILED = 1024
+
+
+class UploadStatus(Enum):
+    PENDING = "pending"
+    UPLOADING = "uploading"
+    UPLOADED = "uploaded"
+    FAILED = "failed"
+
+
+class UploadQueue:
+    """Write-behind queue that uploads artifacts on a background thread.
+
+    Submitting an artifact that is already waiting replaces its bytes in
+    place, so repeated renders of the same artifact collapse into a single
+    upload of the latest version. The queue is bounded; `submit` blocks while
+    it is full.
+
+    A failed upload keeps its bytes and goes back on the queue, to be retried
+    with exponential backoff until it succeeds, a newer version replaces it,
+    or `max_attempts` attempts have failed. Meanwhile its status is `FAILED`
+    and it still counts as pending, so `flush` keeps waiting for it. An
+    upload that runs out of attempts is abandoned: its bytes are dropped,
+    and its `FAILED` status and error are kept for the `max_failed` most
+    recently abandoned artifacts only.
+
+    The queue only tracks artifacts it still holds. Once an upload lands its
+    status is forgotten, so `upload` must record durable uploads itself.
+
+    Args:
+        upload (Callable[[str, str, bytes], None]): Uploads one artifact.
+        max_pending (int): The maximum number of artifacts waiting to upload.
+        retry_base_delay (float): The delay before the first retry, in seconds.
+        retry_max_delay (float): The longest delay between retries, in seconds.
+        max_attempts (int | None): The attempts before an upload is abandoned,
+            or `None` to retry until it succeeds.
+        max_failed (int): The number of abandoned uploads to remember.
+    """
+
+    def __init__(
+        self,
+        upload: Callable[[str, str, bytes], None],
+        max_pending: int = DEFAULT_MAX_PENDING,
+        retry_base_delay: float = DEFAULT_RETRY_BASE_DELAY,
+        retry_max_delay: float = DEFAULT_RETRY_MAX_DELAY,
+        max_attempts: int | None = DEFAULT_MAX_ATTEMPTS,
+        max_failed: int = DEFAULT_MAX_FAILED,
+    ) -> None:
+        if max_pending < 1:
+            raise ValueError("Upload queue must allow at least one pending upload.")
+
+        self._upload = upload
+        self._max_pending = max_pending
+        self._retry_base_delay = retry_base_delay
+        self._retry_max_delay = retry_max_delay
+        self._max_attempts = max_attempts
+        self._max_failed = max_failed
+        self._pending: OrderedDict[tuple[str, str], bytes] = OrderedDict()
+        self._in_flight: dict[tuple[str, str], bytes] = {}
+        self._status: dict[tuple[str, str], UploadStatus] = {}
+        self._errors: dict[tuple[str, str], str] = {}
+        # key -> (failed attempts, monotonic time of the next attempt)
+        self._retries: dict[tuple[str, str], tuple[int, float]] = {}
+        # key -> error of the last attempt, for abandoned uploads, oldest first
+        self._failed: OrderedDict[tuple[str, str], str] = OrderedDict()
+        self._closed = False
+        self._condition = Condition()
+        self._start_worker()
+        after_fork_in_child(self._after_fork)
+
+    def _start_worker(self) -> None:
+        self._worker = Thread(target=self._run, name="upload-queue", daemon=True)
+        self._worker.start()
+
+    def _after_fork(self) -> None:
+        # Queued uploads belong to the parent, which still uploads them; the
+        # child starts empty with a worker of its own.
+        self._pending.clear()
+        self._in_flight.clear()
+        self._status.clear()
+        self._errors.clear()
+        self._retries.clear()
+        self._failed.clear()
+        self._condition = Condition()
+
+        if not self._closed:
+            self._start_worker()
+
+    def submit(self, user_id: str, process_id: str, data: bytes) -> None:
+        key = (user_id, process_id)
+
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Upload queue is closed.")
+
+            if key in self._pending:
+                self._pending[key] = data
+                self._status[key] = UploadStatus.PENDING
+                self._retries.pop(key, None)
+                return
+
+            while len(self._pending) >= self._max_pending and not self._closed:
+                self._condition.wait()
+
+            self._pending[key] = data
+            self._status[key] = UploadStatus.PENDING
+            self._errors.pop(key, None)
+            self._failed.pop(key, None)
+            self._condition.notify_all()
+
+    def pending_bytes(self, user_id: str, process_id: str) -> bytes | None:
+        """Return the newest bytes for an artifact that is not yet durable."""
+        key = (user_id, process_id)
+
+        with self._condition:
+            return self._pending.get(key, self._in_flight.get(key))
+
+    def status(self, user_id: str, process_id: str) -> UploadStatus | None:
+        """Return the status of a queued or abandoned upload, if any."""
+        key = (user_id, process_id)
+
+        with self._condition:
+            if key in self._failed:
+                return UploadStatus.FAILED
+
+            return self._status.get(key)
+
+    def error(self, user_id: str, process_id: str) -> str | None:
+        key = (user_id, process_id)
+
+        with self._condition:
+            return self._errors.get(key, self._failed.get(key))
+
+    def flush(
+        self,
+        user_id: str | None = None,
+        process_id: str | None = None,
+        timeout: float | None = None,
+    ) -> bool:
+        """Wait until one artifact, or every artifact, has been uploaded.
+
+        Failed uploads stay queued for retry, so they keep this waiting
+        until they land or are abandoned.
+
+        Returns:
+            bool: Whether the uploads landed before the timeout. An abandoned
+                upload did not land.
+        """
+        key = None if user_id is None else (user_id, process_id)
+        deadline = None if timeout is None else monotonic() + timeout
+
+        def drained() -> bool:
+            if key is None:
+                return not self._pending and not self._in_flight
+
+            return key not in self._pending and key not in self._in_flight
+
+        with self._condition:
+            while not drained():
+                remaining = None if deadline is None else deadline - monotonic()
+
+                if remaining is not None and remaining <= 0:
+                    return False
+
+                self._condition.wait(remaining)
+
+            return not self._failed if key is None else key not in self._failed
+
+    def close(self, timeout: float | None = None) -> bool:
+        """Upload everything still queued and stop the worker.
+
+        Returns:
+            bool: Whether every queued upload landed before the timeout.
+        """
+        drained = self.flush(timeout=timeout)
+
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+        self._worker.join(timeout)
+
+        if not drained:
+            with self._condition:
+                left = len(self._pending) + len(self._in_flight) + len(self._failed)
+
+            logger.error(f"Upload queue closed with {left} uploads that did not land")
+
+        return drained
+
+    def _retry_delay(self, attempts: int) -> float:
+        return min(self._retry_max_delay, self._retry_base_delay * 2 ** (attempts - 1))
+
+    def _next_ready(self) -> tuple[tuple[str, str] | None, float | None]:
+        """Return the oldest key due for upload, or how long until one is."""
+        now = monotonic()
+        wait: float | None = None
+
+        for key in self._pending:
+            if (retry := self._retries.get(key)) is None or retry[1] <= now:
+                return key, None
+
+            wait = retry[1] - now if wait is None else min(wait, retry[1] - now)
+
+        return None, wait
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while (ready := self._next_ready())[0] is None:
+                    # Once closed, uploads still backing off are abandoned.
+                    if self._closed:
+                        return
+
+                    self._condition.wait(ready[1])
+
+                key = ready[0]
+                data = self._pending.pop(key)
+                self._in_flight[key] = data
+                self._status[key] = UploadStatus.UPLOADING
+                self._condition.notify_all()
+
+            try:
+                self._upload(*key, data)
+                error = None
+
+            except Exception as e:
+                logger.error(
+                    f"Error uploading artifact for user_id: {key[0]}, render_id: {key[1]}: {e}"
+                )
+                error = str(e)
+
+            with self._condition:
+                del self._in_flight[key]
+
+                if error is None:
+                    self._retries.pop(key, None)
+                    self._errors.pop(key, None)
+
+                    if key not in self._pending:
+                        self._forget(key)
+
+                elif key in self._pending:
+                    # A newer version was submitted meanwhile and replaces
+                    # the bytes that failed.
+                    self._errors[key] = error
+
+                elif (
+                    attempts := self._retries.get(key, (0, 0.0))[0] + 1
+                ) == self._max_attempts:
+                    logger.error(
+                        f"Abandoned upload for user_id: {key[0]}, render_id: {key[1]} after {attempts} attempts"
+                    )
+                    self._forget(key)
+                    self._failed[key] = error
+
+                    while len(self._failed) > self._max_failed:
+                        self._failed.popitem(last=False)
+
+                else:
+                    self._pending[key] = data
+                    self._retries[key] = (
+                        attempts,
+                        monotonic() + self._retry_delay(attempts),
+                    )
+                    self._status[key] = UploadStatus.FAILED
+                    self._errors[key] = error
+
+                self._condition.notify_all()
+
+    def _forget(self, key: tuple[str, str]) -> None:
+        """Drop the state of an artifact that is no longer queued."""
+        self._status.pop(key, None)
+        self._errors.pop(key, None)
+        self._retries.pop(key, None)
@@ -1,6 +1,16 @@
+from json import JSONDecodeError, dumps, loads
+from os import getpid
 from pathlib import Path
+from shutil import rmtree
+from threading import get_ident
+from typing import Any
 
 from storage.online.blob_storage import OnlineStorage
+from storage.upload_queue import UploadQueue
+from utils.concurrency import SingleFlight
+from utils.hashing import canonical_json
+from utils.metrics import ARTIFACT_READS, stage_timer
+from utils.payload import Payload
 
 online_storage: OnlineStorage | None = None
 
@@ -8,7 +18,14 @@ WORKSPACE_DIRNAME = "workspace"
 ARTIFACTS_DIRNAME = "artifacts"
 ARTIFACT_FILENAME = "resume.docx"
 METADATA_FILENAME = "metadata.json"
+PAYLOAD_FILENAME = "payload.json"
 MANIFEST_FILENAME = "manifest.json"
+SHARED_MANIFEST_FILENAME = "manifest.db"
+LOCKS_DIRNAME = ".locks"
+LOCK_SUFFIX = ".lock"
+# Payloads are stored online as artifacts whose job id carries this suffix,
+# which real job ids cannot contain.
+ONLINE_PAYLOAD_SUFFIX = ".payload"
 
 DOT = "."
 SLASH = "/"
@@ -16,6 +33,8 @@ SLASH = "/"
 
 online_storage: OnlineStorage | None = None
 
+_downloads: SingleFlight = SingleFlight()
+
 
 def create_workspace(root_parent: Path | str | None = None) -> Path:
     workspace_dir = Path(root_parent, WORKSPACE_DIRNAME)
@@ -36,6 +55,45 @@ def _job_dir(workspace_dir: Path, user_id: str, job_id: str) -> Path:
     return path
 
 
+def artifact_path(workspace_dir: Path, user_id: str, job_id: str) -> Path:
+    return _job_dir(workspace_dir, user_id, job_id) / ARTIFACT_FILENAME
+
+
+def online_payload_id(job_id: str) -> str:
+    """Return the online storage id of the job's payload."""
+    _throw_if_has_invalid_characters(job_id)
+    return f"{job_id}{ONLINE_PAYLOAD_SUFFIX}"
+
+
+def lock_path(workspace_dir: Path, user_id: str, job_id: str) -> Path:
+    """Return the file locked while a process modifies the artifact.
+
+    Lock files live outside the artifact directories, so clearing an
+    artifact directory never removes a lock another process holds. Only
+    `delete_artifact` removes them, while holding the lock.
+    """
+    _throw_if_has_invalid_characters(user_id)
+    _throw_if_has_invalid_characters(job_id)
+    return workspace_dir / LOCKS_DIRNAME / user_id / f"{job_id}{LOCK_SUFFIX}"
+
+
+def _temporary_path(path: Path) -> Path:
+    return path.with_name(f".{path.name}.{getpid()}.{get_ident()}.tmp")
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    """Write a file so concurrent readers see either the old or new bytes."""
+    tmp = _temporary_path(path)
+
+    try:
+        tmp.write_bytes(data)
+        tmp.replace(path)
+
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
 def create_artifact(workspace_dir: Path, user_id: str, job_id: str) -> Path:
     path = _job_dir(workspace_dir, user_id, job_id)
     path.mkdir(parents=True, exist_ok=True)
@@ -45,20 +103,204 @@ def create_artifact(workspace_dir: Path, user_id: str, job_id: str) -> Path:
 
 def get_artifact(workspace_dir: Path, user_id: str, job_id: str) -> Path:
     path = _job_dir(workspace_dir, user_id, job_id)
+    artifact = path / ARTIFACT_FILENAME
 
-    if not online_storage.artifact_exists(user_id, job_id) and not path.exists():
-        raise FileNotFoundError(
-            "Artifact does not exist locally or online. The artifact likely was never created or has been deleted."
-        )
+    with stage_timer("artifact_local"):
+        local = artifact.exists()
+
+    if local:
+        ARTIFACT_READS.inc("local")
+        return path
+
+    def download() -> None:
+        if artifact.exists():
+            return
+
+        with stage_timer("artifact_exists"):
+            exists = online_storage.artifact_exists(user_id, job_id)
+
+        if not exists:
+            raise FileNotFoundError(
+                "Artifact does not exist locally or online. The artifact likely was never created or has been deleted."
+            )
 
-    if not path.exists():
         path.mkdir(parents=True, exist_ok=True)
-        with open(path / ARTIFACT_FILENAME, "wb") as f:
-            f.write(online_storage.download_artifact(user_id, job_id))
+        tmp = _temporary_path(artifact)
+
+        try:
+            with stage_timer("artifact_download"), open(tmp, "wb") as f:
+                for chunk in online_storage.download_artifact_stream(user_id, job_id):
+                    f.write(chunk)
+            tmp.replace(artifact)
+
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+        ARTIFACT_READS.inc("remote")
+
+    _downloads.do((workspace_dir, user_id, job_id, ARTIFACT_FILENAME), download)
 
     return path
 
 
+def read_artifact(
+    workspace_dir: Path,
+    user_id: str,
+    job_id: str,
+    upload_queue: UploadQueue | None = None,
+) -> bytes:
+    """Return the artifact package bytes without writing anything to disk.
+
+    Bytes still waiting in the upload queue win, then the local copy, and
+    otherwise the artifact is downloaded straight into memory.
+    """
+    if (
+        upload_queue is not None
+        and (data := upload_queue.pending_bytes(user_id, job_id)) is not None
+    ):
+        ARTIFACT_READS.inc("queue")
+        return data
+
+    artifact = artifact_path(workspace_dir, user_id, job_id)
+
+    if artifact.exists():
+        with stage_timer("artifact_local"):
+            data = artifact.read_bytes()
+
+        ARTIFACT_READS.inc("local")
+        return data
+
+    def download() -> bytes:
+        with stage_timer("artifact_exists"):
+            exists = online_storage.artifact_exists(user_id, job_id)
+
+        if not exists:
+            raise FileNotFoundError(
+                "Artifact does not exist locally or online. The artifact likely was never created or has been deleted."
+            )
+
+        with stage_timer("artifact_download"):
+            data = online_storage.download_artifact(user_id, job_id)
+
+        ARTIFACT_READS.inc("remote")
+        return data
+
+    return _downloads.do((workspace_dir, user_id, job_id), download)
+
+
+def write_artifact(
+    workspace_dir: Path,
+    user_id: str,
+    job_id: str,
+    data: bytes,
+    keep_local: bool = True,
+    upload_queue: UploadQueue | None = None,
+) -> None:
+    """Upload in-memory artifact bytes, optionally keeping a local copy.
+
+    With an upload queue the upload happens in the background and this
+    returns as soon as the local copy is written.
+    """
+    path = _job_dir(workspace_dir, user_id, job_id)
+
+    if keep_local:
+        path.mkdir(parents=True, exist_ok=True)
+        _write_atomic(path / ARTIFACT_FILENAME, data)
+
+    if upload_queue is not None:
+        upload_queue.submit(user_id, job_id, data)
+    else:
+        with stage_timer("artifact_upload"):
+            online_storage.upload_artifact(user_id, job_id, data)
+
+
+def read_metadata(workspace_dir: Path, user_id: str, job_id: str) -> dict[str, Any]:
+    """Return the local metadata recorded next to the artifact, if any."""
+    path = _job_dir(workspace_dir, user_id, job_id) / METADATA_FILENAME
+
+    try:
+        return loads(path.read_text(encoding="utf-8"))
+
+    except (FileNotFoundError, JSONDecodeError):
+        return {}
+
+
+def write_metadata(
+    workspace_dir: Path, user_id: str, job_id: str, metadata: dict[str, Any]
+) -> None:
+    path = _job_dir(workspace_dir, user_id, job_id)
+    path.mkdir(parents=True, exist_ok=True)
+
+    _write_atomic(path / METADATA_FILENAME, dumps(metadata).encode("utf-8"))
+
+
+def read_payload(
+    workspace_dir: Path,
+    user_id: str,
+    job_id: str,
+    upload_queue: UploadQueue | None = None,
+) -> Payload | None:
+    """Return the payload of the artifact's last render, if one was recorded.
+
+    Like `read_artifact`, bytes still waiting in the upload queue win, then
+    the local copy, and otherwise the copy stored online is downloaded.
+    """
+    path = _job_dir(workspace_dir, user_id, job_id) / PAYLOAD_FILENAME
+    payload_id = online_payload_id(job_id)
+
+    if (
+        upload_queue is not None
+        and (data := upload_queue.pending_bytes(user_id, payload_id)) is not None
+    ):
+        return loads(data)
+
+    try:
+        return loads(path.read_text(encoding="utf-8"))
+
+    except (FileNotFoundError, JSONDecodeError):
+        pass
+
+    if online_storage is None:
+        return None
+
+    def download() -> bytes | None:
+        if not online_storage.artifact_exists(user_id, payload_id):
+            return None
+
+        with stage_timer("payload_download"):
+            return online_storage.download_artifact(user_id, payload_id)
+
+    data = _downloads.do((workspace_dir, user_id, payload_id), download)
+
+    return None if data is None else loads(data)
+
+
+def write_payload(
+    workspace_dir: Path,
+    user_id: str,
+    job_id: str,
+    payload: Payload,
+    upload_queue: UploadQueue | None = None,
+) -> None:
+    """Record the payload of the artifact's last render in canonical form.
+
+    The payload is kept next to the local copy and uploaded next to the
+    artifact, so it outlives the local copy.
+    """
+    path = _job_dir(workspace_dir, user_id, job_id)
+    path.mkdir(parents=True, exist_ok=True)
+    data = canonical_json(payload).encode("utf-8")
+
+    _write_atomic(path / PAYLOAD_FILENAME, data)
+
+    if upload_queue is not None:
+        upload_queue.submit(user_id, online_payload_id(job_id), data)
+    else:
+        with stage_timer("payload_upload"):
+            online_storage.upload_artifact(user_id, online_payload_id(job_id), data)
+
+
 def save_artifact(
     workspace_dir: Path, user_id: str, job_id: str, clear_local: bool = False
 ) -> None:
@@ -66,10 +308,60 @@ def save_artifact(
     path.mkdir(parents=True, exist_ok=True)
 
     artifact = path / ARTIFACT_FILENAME
-    with open(artifact, "rb") as f:
-        online_storage.upload_artifact(user_id, job_id, f.read())
+    with stage_timer("artifact_upload"), open(artifact, "rb") as f:
+        online_storage.upload_artifact_stream(user_id, job_id, f)
 
     if clear_local:
         for item in path.iterdir():
             item.unlink()
         path.rmdir()
+
+
+def delete_artifact(workspace_dir: Path, user_id: str, job_id: str) -> None:
+    """Delete everything kept locally for an artifact.
+
+    Removes the artifact's directory, with its metadata and payload, and its
+    lock file. The caller holds the artifact's lock: a lock stays valid
+    after its file is deleted, and waiters then lock a new file.
+    """
+    path = _job_dir(workspace_dir, user_id, job_id)
+
+    if path.exists():
+        rmtree(path)
+
+    lock_path(workspace_dir, user_id, job_id).unlink(missing_ok=True)
+
+
+def list_artifacts(workspace_dir: Path) -> list[tuple[str, str]]:
+    """Return the `(user_id, job_id)` pairs that have a local directory."""
+    artifacts: list[tuple[str, str]] = []
+
+    for user_dir in workspace_dir.iterdir():
+        if user_dir.name.startswith(DOT) or not user_dir.is_dir():
+            continue
+
+        jobs_dir = user_dir / ARTIFACTS_DIRNAME
+
+        if jobs_dir.is_dir():
+            artifacts.extend(
+                (user_dir.name, job_dir.name)
+                for job_dir in jobs_dir.iterdir()
+                if job_dir.is_dir()
+            )
+
+    return artifacts
+
+
+def list_locks(workspace_dir: Path) -> list[tuple[str, str]]:
+    """Return the `(user_id, job_id)` pairs that have a lock file."""
+    locks_dir = workspace_dir / LOCKS_DIRNAME
+
+    if not locks_dir.is_dir():
+        return []
+
+    return [
+        (user_dir.name, lock.name.removesuffix(LOCK_SUFFIX))
+        for user_dir in locks_dir.iterdir()
+        if user_dir.is_dir()
+        for lock in user_dir.glob(f"*{LOCK_SUFFIX}")
+    ]
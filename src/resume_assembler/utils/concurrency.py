@@ -0,0 +1,229 @@
+from collections.abc import Callable, Generator, Hashable
+from contextlib import contextmanager
+from fcntl import LOCK_EX, LOCK_NB, LOCK_UN, flock
+from os import O_CREAT, O_RDWR, fstat, register_at_fork
+from os import close as close_fd
+from os import open as open_fd
+from pathlib import Path
+from threading import Event, Lock, RLock
+from typing import Generic, TypeVar
+from weakref import WeakMethod
+
+T = TypeVar("T")
+
+
+class KeyedLocks:
+    """Re-entrant locks created on demand for each key.
+
+    A key's lock is dropped once nobody holds or waits for it, so the number
+    of live locks stays proportional to concurrent work rather than to the
+    number of keys ever seen.
+    """
+
+    def __init__(self) -> None:
+        self._locks: dict[Hashable, tuple[RLock, int]] = {}
+        self._guard = Lock()
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    def acquire(self, key: Hashable, blocking: bool = True) -> bool:
+        with self._guard:
+            lock, users = self._locks.get(key, (None, 0))
+
+            if lock is None:
+                lock = RLock()
+
+            self._locks[key] = (lock, users + 1)
+
+        if lock.acquire(blocking):
+            return True
+
+        self._forget(key)
+
+        return False
+
+    def release(self, key: Hashable) -> None:
+        lock = self._forget(key)
+        lock.release()
+
+    def _forget(self, key: Hashable) -> RLock:
+        with self._guard:
+            lock, users = self._locks[key]
+
+            if users == 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, users - 1)
+
+        return lock
+
+    @contextmanager
+    def hold(
+        self,
+        key: Hashable,
+        blocking: bool = True,
+    ) -> Generator[bool, None, None]:
+        """Hold the key's lock, yielding whether it was acquired.
+
+        Without `blocking`, a lock held by another thread is not waited for
+        and `False` is yielded instead.
+        """
+        if not self.acquire(key, blocking):
+            yield False
+            return
+
+        try:
+            yield True
+        finally:
+            self.release(key)
+
+
+class FileLocks:
+    """Keyed locks that exclude other threads and other processes.
+
+    Threads of this process are serialized by a `KeyedLocks`, and the
+    thread that holds a key then takes an exclusive `flock` on the key's
+    lock file. Holding a key again from the same thread is re-entrant and
+    reuses the open lock file.
+
+    Args:
+        path_for (Callable[[Hashable], Path]): Returns the lock file for a key.
+    """
+
+    def __init__(self, path_for: Callable[[Hashable], Path]) -> None:
+        self._path_for = path_for
+        self._threads = KeyedLocks()
+        # key -> (lock file descriptor, hold depth), touched only by the holder
+        self._held: dict[Hashable, tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._held)
+
+    def _open_locked(self, key: Hashable, blocking: bool) -> int | None:
+        path = self._path_for(key)
+
+        while True:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd = open_fd(path, O_RDWR | O_CREAT, 0o644)
+
+            try:
+                flock(fd, LOCK_EX if blocking else LOCK_EX | LOCK_NB)
+
+                # A holder may have deleted the lock file while this process
+                # waited on it; the lock is only valid on the current file.
+                if fstat(fd).st_ino == path.stat().st_ino:
+                    return fd
+
+            except BlockingIOError:
+                close_fd(fd)
+                return None
+
+            except FileNotFoundError:
+                pass
+
+            except BaseException:
+                close_fd(fd)
+                raise
+
+            close_fd(fd)
+
+    @contextmanager
+    def hold(
+        self,
+        key: Hashable,
+        blocking: bool = True,
+    ) -> Generator[bool, None, None]:
+        """Hold the key's lock, yielding whether it was acquired.
+
+        The lock file may be deleted while it is held, e.g. together with
+        the artifact it guards; waiters then lock the next file instead.
+        """
+        with self._threads.hold(key, blocking) as acquired:
+            if not acquired:
+                yield False
+                return
+
+            fd, depth = self._held.get(key, (-1, 0))
+
+            if depth == 0 and (fd := self._open_locked(key, blocking)) is None:
+                yield False
+                return
+
+            self._held[key] = (fd, depth + 1)
+
+            try:
+                yield True
+
+            finally:
+                if depth == 0:
+                    del self._held[key]
+                    flock(fd, LOCK_UN)
+                    close_fd(fd)
+                else:
+                    self._held[key] = (fd, depth)
+
+
+def after_fork_in_child(method: Callable[[], None]) -> None:
+    """Call a bound method in the child process after every `os.fork`.
+
+    Objects that own threads use this to restart them, since a forked child
+    only inherits the thread that forked. The object is referenced weakly,
+    so registering does not keep it alive.
+    """
+    ref = WeakMethod(method)
+
+    def call() -> None:
+        if (bound := ref()) is not None:
+            bound()
+
+    register_at_fork(after_in_child=call)
+
+
+class _Flight(Generic[T]):
+    def __init__(self) -> None:
+        self.done = Event()
+        self.result: T | None = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight(Generic[T]):
+    """Collapse concurrent calls for the same key into one execution.
+
+    The first caller for a key runs the function; callers that arrive while
+    it is running wait and receive the same result or exception.
+    """
+
+    def __init__(self) -> None:
+        self._flights: dict[Hashable, _Flight[T]] = {}
+        self._lock = Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+
+            if flight.error is not None:
+                raise flight.error
+
+            return flight.result
+
+        try:
+            flight.result = fn()
+            return flight.result
+
+        except BaseException as e:
+            flight.error = e
+            raise
+
+        finally:
+            with self._lock:
+                del self._flights[key]
+
+            flight.done.set()
@@ -1,8 +1,12 @@
-from collections.abc import Callable, Mapping
+from collections.abc import Callable, Iterable, Mapping
 from datetime import datetime
 from enum import Enum
+from functools import lru_cache
 from json import dumps
 
+PRESENT = "present"
+DATE_CACHE_SIZE = 4096
+
 
 class DateFormat(Enum):
     MONTH_YEAR_ABBR = "mon_year_abbr"  # Jan 2020
@@ -69,3 +73,68 @@ def stringify_date(dt: datetime | None, date_format: DateFormat) -> str | None:
     if not isinstance(dt, datetime):
         raise ValueError(f"Invalid date value: {dt}")
     return format_date[date_format](dt)
+
+
+# Names accepted in `item_date_style.date_format` besides the enum values.
+DATE_FORMAT_ALIASES: Mapping[str, DateFormat] = {
+    "month_year_short": DateFormat.MONTH_YEAR_ABBR,
+    "month_year_long": DateFormat.MONTH_YEAR_FULL,
+}
+
+
+def resolve_date_format(name: str | None) -> DateFormat | None:
+    if not name:
+        return None
+
+    if name in DATE_FORMAT_ALIASES:
+        return DATE_FORMAT_ALIASES[name]
+
+    try:
+        return DateFormat(name)
+
+    except ValueError:
+        return None
+
+
+def parse_date(raw: str) -> datetime | None:
+    """Parse a payload date of the form `YYYY`, `YYYY-MM` or `YYYY-MM-DD`."""
+    parts = raw.strip().split("-")
+
+    if not 1 <= len(parts) <= 3 or not all(part.isdigit() for part in parts):
+        return None
+
+    try:
+        return datetime(*(int(part) for part in parts), *(1,) * (3 - len(parts)))
+
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def format_date_string(raw: str, date_format: str | None) -> str:
+    """Format a payload date string, memoized on `(raw, date_format)`.
+
+    `present` is title-cased. Dates that cannot be parsed, and unknown or
+    missing formats, leave the string unchanged.
+    """
+    if (resolved := resolve_date_format(date_format)) is None:
+        return raw
+
+    if raw.strip().lower() == PRESENT:
+        return PRESENT.title()
+
+    if (dt := parse_date(raw)) is None:
+        return raw
+
+    return format_date[resolved](dt)
+
+
+def format_date_strings(
+    raws: Iterable[str | None], date_format: str | None
+) -> dict[str, str]:
+    """Format many payload date strings in one pass.
+
+    Returns:
+        dict[str, str]: Each distinct raw date mapped to its formatted form.
+    """
+    return {raw: format_date_string(raw, date_format) for raw in set(raws) if raw}
@@ -0,0 +1,28 @@
+from hashlib import sha256
+from json import dumps
+from typing import Any
+
+
+def canonical_json(value: Any) -> str:
+    """Serialize a JSON-like value so that equal values produce equal strings.
+
+    Mapping keys are sorted and insignificant whitespace is dropped, so two
+    payloads that only differ in key order serialize identically.
+    """
+    return dumps(
+        value,
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=str,
+    )
+
+
+def canonical_hash(value: Any) -> str:
+    """Return the hex SHA-256 digest of the canonical JSON form of `value`."""
+    return sha256(canonical_json(value).encode("utf-8")).hexdigest()
+
+
+def bytes_hash(data: bytes) -> str:
+    """Return the hex SHA-256 digest of raw bytes."""
+    return sha256(data).hexdigest()
@@ -0,0 +1,254 @@
+from collections.abc import Mapping, MutableMapping, Sequence
+from copy import deepcopy
+from typing import Any
+
+# A resolved location in a document; array indices are ints.
+Path = tuple[str | int, ...]
+
+_VALUE_OPS = ("add", "replace", "test")
+_FROM_OPS = ("move", "copy")
+
+
+class JsonPatchError(ValueError):
+    """Raised when a JSON Patch operation is malformed or cannot be applied."""
+
+    def __init__(self, index: int, message: str) -> None:
+        self.index = index
+        self.message = message
+        super().__init__(f"Patch operation {index}: {message}")
+
+
+def parse_pointer(pointer: str) -> tuple[str, ...]:
+    """Split an RFC 6901 JSON Pointer into its unescaped reference tokens."""
+    if pointer == "":
+        return ()
+
+    if not pointer.startswith("/"):
+        raise ValueError(f"invalid JSON pointer {pointer!r}")
+
+    return tuple(
+        token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")
+    )
+
+
+def _array_index(array: list, token: str, allow_end: bool) -> int:
+    if allow_end and token == "-":
+        return len(array)
+
+    if not token.isdigit() or (len(token) > 1 and token[0] == "0"):
+        raise ValueError(f"invalid array index {token!r}")
+
+    index = int(token)
+
+    if index > len(array) or (index == len(array) and not allow_end):
+        raise ValueError(f"array index {index} is out of range")
+
+    return index
+
+
+def _resolve(document: Any, tokens: Sequence[str]) -> tuple[Any, Path]:
+    """Return the value at `tokens` and its resolved path."""
+    node = document
+    path: list[str | int] = []
+
+    for token in tokens:
+        if isinstance(node, list):
+            index = _array_index(node, token, allow_end=False)
+            node = node[index]
+            path.append(index)
+
+        elif isinstance(node, Mapping):
+            if token not in node:
+                raise ValueError(f"member {token!r} does not exist")
+
+            node = node[token]
+            path.append(token)
+
+        else:
+            raise ValueError(f"cannot reference {token!r} inside a scalar value")
+
+    return node, tuple(path)
+
+
+def _json_equal(a: Any, b: Any) -> bool:
+    """Compare JSON values, treating booleans and numbers as different types."""
+    if isinstance(a, bool) or isinstance(b, bool):
+        return type(a) is type(b) and a == b
+
+    if isinstance(a, Mapping) and isinstance(b, Mapping):
+        return a.keys() == b.keys() and all(_json_equal(a[k], b[k]) for k in a)
+
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(_json_equal(x, y) for x, y in zip(a, b))
+
+    return a == b
+
+
+class _Patcher:
+    """Applies operations to one document and records the paths they touch.
+
+    Recorded paths always refer to the current document: inserting into or
+    removing from an array shifts the recorded paths of later elements, and
+    drops those of a removed element.
+    """
+
+    def __init__(self, document: Any) -> None:
+        self.document = document
+        self.touched: list[Path] = []
+
+    def _shift(self, array: Path, index: int, delta: int) -> None:
+        depth = len(array)
+        shifted: list[Path] = []
+
+        for path in self.touched:
+            if (
+                len(path) <= depth
+                or path[:depth] != array
+                or not isinstance(path[depth], int)
+                or path[depth] < index
+            ):
+                shifted.append(path)
+
+            elif delta > 0:
+                shifted.append((*array, path[depth] + 1, *path[depth + 1 :]))
+
+            elif path[depth] > index:
+                shifted.append((*array, path[depth] - 1, *path[depth + 1 :]))
+
+        self.touched = shifted
+
+    def get(self, tokens: Sequence[str]) -> Any:
+        return _resolve(self.document, tokens)[0]
+
+    def add(self, tokens: Sequence[str], value: Any) -> None:
+        if not tokens:
+            self.document = value
+            self.touched = [()]
+            return
+
+        parent, parent_path = _resolve(self.document, tokens[:-1])
+
+        if isinstance(parent, list):
+            index = _array_index(parent, tokens[-1], allow_end=True)
+            parent.insert(index, value)
+            self._shift(parent_path, index, 1)
+            self.touched.append((*parent_path, index))
+
+        elif isinstance(parent, MutableMapping):
+            parent[tokens[-1]] = value
+            self.touched.append((*parent_path, tokens[-1]))
+
+        else:
+            raise ValueError(f"cannot add {tokens[-1]!r} to a scalar value")
+
+    def remove(self, tokens: Sequence[str]) -> Any:
+        if not tokens:
+            raise ValueError("cannot remove the whole document")
+
+        parent, parent_path = _resolve(self.document, tokens[:-1])
+
+        if isinstance(parent, list):
+            index = _array_index(parent, tokens[-1], allow_end=False)
+            value = parent.pop(index)
+            self._shift(parent_path, index, -1)
+            self.touched.append((*parent_path, index))
+
+            return value
+
+        if isinstance(parent, MutableMapping):
+            if tokens[-1] not in parent:
+                raise ValueError(f"member {tokens[-1]!r} does not exist")
+
+            self.touched.append((*parent_path, tokens[-1]))
+
+            return parent.pop(tokens[-1])
+
+        raise ValueError(f"cannot remove {tokens[-1]!r} from a scalar value")
+
+    def replace(self, tokens: Sequence[str], value: Any) -> None:
+        if not tokens:
+            self.document = value
+            self.touched = [()]
+            return
+
+        _, path = _resolve(self.document, tokens)
+        parent = _resolve(self.document, tokens[:-1])[0]
+        parent[path[-1]] = value
+        self.touched.append(path)
+
+    def apply(self, operation: Any) -> None:
+        if not isinstance(operation, Mapping):
+            raise ValueError("operation must be an object")
+
+        op = operation.get("op")
+
+        if op not in (*_VALUE_OPS, *_FROM_OPS, "remove"):
+            raise ValueError(f"unknown operation {op!r}")
+
+        if not isinstance(operation.get("path"), str):
+            raise ValueError("'path' must be a string")
+
+        if op in _VALUE_OPS and "value" not in operation:
+            raise ValueError(f"'{op}' requires a 'value'")
+
+        if op in _FROM_OPS and not isinstance(operation.get("from"), str):
+            raise ValueError(f"'{op}' requires a 'from' string")
+
+        tokens = parse_pointer(operation["path"])
+
+        if op == "add":
+            self.add(tokens, deepcopy(operation["value"]))
+
+        elif op == "remove":
+            self.remove(tokens)
+
+        elif op == "replace":
+            self.replace(tokens, deepcopy(operation["value"]))
+
+        elif op == "move":
+            source = parse_pointer(operation["from"])
+
+            if tokens[: len(source)] == source and tokens != source:
+                raise ValueError("cannot move a value into one of its children")
+
+            if tokens == source:
+                self.get(source)
+            else:
+                self.add(tokens, self.remove(source))
+
+        elif op == "copy":
+            self.add(tokens, deepcopy(self.get(parse_pointer(operation["from"]))))
+
+        elif not _json_equal(self.get(tokens), operation["value"]):
+            raise ValueError(f"test failed at {operation['path']!r}")
+
+
+def apply_patch(document: Any, operations: Sequence[Any]) -> tuple[Any, list[Path]]:
+    """Apply an RFC 6902 JSON Patch to `document` in place.
+
+    Operations run in order. When one fails, `document` is left with the
+    earlier operations applied, so callers should discard it.
+
+    Args:
+        document (Any): The JSON document to modify.
+        operations (Sequence[Any]): The patch operations.
+    Returns:
+        tuple[Any, list[Path]]: The patched document, which is a new object
+            only if the root was replaced, and the paths of every value the
+            patch added, replaced or removed.
+    Raises:
+        JsonPatchError: If an operation is malformed or cannot be applied.
+    """
+    if isinstance(operations, (str, bytes)) or not isinstance(operations, Sequence):
+        raise JsonPatchError(0, "patch must be an array of operations")
+
+    patcher = _Patcher(document)
+
+    for index, operation in enumerate(operations):
+        try:
+            patcher.apply(operation)
+
+        except ValueError as e:
+            raise JsonPatchError(index, str(e)) from e
+
+    return patcher.document, patcher.touched
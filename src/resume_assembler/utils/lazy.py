@@ -0,0 +1,44 @@
+from importlib import import_module
+from threading import Lock
+from types import ModuleType
+from typing import Any
+
+
+class LazyModule(ModuleType):
+    """A module that is imported the first time one of its attributes is used.
+
+    Lets modules that are only needed to serve a request, such as the
+    python-docx renderer, stay out of the import graph of `app.py` until
+    the first request or the startup warmup.
+
+    Args:
+        name (str): The fully qualified name of the module to import.
+    """
+
+    def __init__(self, name: str) -> None:
+        super().__init__(name)
+        self._lazy_lock = Lock()
+        self._lazy_module: ModuleType | None = None
+
+    def _load(self) -> ModuleType:
+        with self._lazy_lock:
+            if self._lazy_module is None:
+                self._lazy_module = import_module(self.__name__)
+
+            return self._lazy_module
+
+    def __getattr__(self, attr: str) -> Any:
+        module = self._lazy_module or self._load()
+        value = getattr(module, attr)
+        # Cache on the proxy so later lookups skip __getattr__ entirely.
+        setattr(self, attr, value)
+
+        return value
+
+    @property
+    def loaded(self) -> bool:
+        return self._lazy_module is not None
+
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
@@ -0,0 +1,339 @@
+from bisect import bisect_left
+from collections.abc import Callable, Iterable, Mapping
+from functools import wraps
+from inspect import iscoroutinefunction
+from threading import Lock
+from time import perf_counter
+from typing import ParamSpec, TypeVar
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# label value -> (per-bucket counts, +Inf last, and sum of observations)
+HistogramSeries = dict[str, tuple[list[int], float]]
+# Stage durations and stage errors recorded in another process.
+StageRecord = tuple[HistogramSeries, dict[str, float]]
+
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_float(value: float) -> str:
+    return repr(float(value)) if value != int(value) else f"{int(value)}"
+
+
+class Counter:
+    """A counter with a single label, rendered as a Prometheus counter."""
+
+    def __init__(self, name: str, help: str, label: str) -> None:
+        self.name = name
+        self.help = help
+        self.label = label
+        self._values: dict[str, float] = {}
+        self._lock = Lock()
+
+    def inc(self, label_value: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def value(self, label_value: str) -> float:
+        with self._lock:
+            return self._values.get(label_value, 0)
+
+    def snapshot(self) -> dict[str, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, values: Mapping[str, float]) -> None:
+        """Add counts recorded elsewhere, e.g. in another process."""
+        for label_value, amount in values.items():
+            self.inc(label_value, amount)
+
+    def render(self) -> Iterable[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+
+        for label_value, value in values:
+            yield f'{self.name}{{{self.label}="{_escape(label_value)}"}} {_format_float(value)}'
+
+
+class Histogram:
+    """A histogram with a single label, rendered as a Prometheus histogram.
+
+    Observations only bump one bucket slot under a lock; the cumulative
+    bucket counts Prometheus expects are computed when rendering.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        label: str,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(sorted(buckets))
+        # label value -> [per-bucket counts (+Inf last), sum]
+        self._series: dict[str, tuple[list[int], list[float]]] = {}
+        self._lock = Lock()
+
+    def observe(self, label_value: str, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+
+        with self._lock:
+            if (series := self._series.get(label_value)) is None:
+                series = self._series[label_value] = (
+                    [0] * (len(self.buckets) + 1),
+                    [0.0],
+                )
+
+            series[0][index] += 1
+            series[1][0] += value
+
+    def count(self, label_value: str) -> int:
+        with self._lock:
+            series = self._series.get(label_value)
+            return sum(series[0]) if series else 0
+
+    def snapshot(self) -> HistogramSeries:
+        with self._lock:
+            return {
+                label_value: (list(counts), total[0])
+                for label_value, (counts, total) in self._series.items()
+            }
+
+    def merge(self, series: HistogramSeries) -> None:
+        """Add observations recorded elsewhere, e.g. in another process."""
+        with self._lock:
+            for label_value, (counts, total) in series.items():
+                if (own := self._series.get(label_value)) is None:
+                    own = self._series[label_value] = (
+                        [0] * (len(self.buckets) + 1),
+                        [0.0],
+                    )
+
+                for index, bucket_count in enumerate(counts):
+                    own[0][index] += bucket_count
+
+                own[1][0] += total
+
+    def render(self) -> Iterable[str]:
+        with self._lock:
+            snapshot = sorted(
+                (label_value, list(counts), total[0])
+                for label_value, (counts, total) in self._series.items()
+            )
+
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+
+        for label_value, counts, total in snapshot:
+            label = f'{self.label}="{_escape(label_value)}"'
+            cumulative = 0
+
+            for bound, bucket_count in zip((*self.buckets, None), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound is None else _format_float(bound)
+                yield f'{self.name}_bucket{{{label},le="{le}"}} {cumulative}'
+
+            yield f"{self.name}_sum{{{label}}} {repr(total)}"
+            yield f"{self.name}_count{{{label}}} {cumulative}"
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: list[Counter | Histogram] = []
+
+    def counter(self, name: str, help: str, label: str) -> Counter:
+        counter = Counter(name, help, label)
+        self._metrics.append(counter)
+
+        return counter
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        label: str,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        histogram = Histogram(name, help, label, buckets)
+        self._metrics.append(histogram)
+
+        return histogram
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text exposition format."""
+        return (
+            "\n".join(line for metric in self._metrics for line in metric.render())
+            + "\n"
+        )
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "resume_stage_duration_seconds",
+    "Time spent in each stage of a tool call.",
+    "stage",
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "resume_stage_errors_total",
+    "Stages that raised an exception.",
+    "stage",
+)
+TOOL_SECONDS = REGISTRY.histogram(
+    "resume_tool_duration_seconds",
+    "Total time spent in each MCP tool call.",
+    "tool",
+)
+TOOL_ERRORS = REGISTRY.counter(
+    "resume_tool_errors_total",
+    "MCP tool calls that raised an exception.",
+    "tool",
+)
+ARTIFACT_READS = REGISTRY.counter(
+    "resume_artifact_reads_total",
+    "Artifact reads by where the bytes were found: queue, local or remote.",
+    "source",
+)
+
+
+class _Timer:
+    __slots__ = ("histogram", "errors", "label", "start")
+
+    def __init__(self, histogram: Histogram, errors: Counter, label: str) -> None:
+        self.histogram = histogram
+        self.errors = errors
+        self.label = label
+
+    def __enter__(self) -> None:
+        self.start = perf_counter()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.histogram.observe(self.label, perf_counter() - self.start)
+
+        if exc_type is not None:
+            self.errors.inc(self.label)
+
+
+def stage_timer(stage: str) -> _Timer:
+    """Time a block of code as one stage of a tool call."""
+    return _Timer(STAGE_SECONDS, STAGE_ERRORS, stage)
+
+
+def tool_timer(tool: str) -> _Timer:
+    """Time a whole MCP tool call."""
+    return _Timer(TOOL_SECONDS, TOOL_ERRORS, tool)
+
+
+def _timed(
+    timer: Callable[[str], _Timer], label: str
+) -> Callable[[Callable[P, R]], Callable[P, R]]:
+    def decorator(fn: Callable[P, R]) -> Callable[P, R]:
+        if iscoroutinefunction(fn):
+
+            @wraps(fn)
+            async def async_wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+                with timer(label):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            with timer(label):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _histogram_delta(
+    before: HistogramSeries, after: HistogramSeries
+) -> HistogramSeries:
+    delta: HistogramSeries = {}
+
+    for label_value, (counts, total) in after.items():
+        previous, previous_total = before.get(label_value, ([0] * len(counts), 0.0))
+
+        if counts != previous:
+            delta[label_value] = (
+                [count - old for count, old in zip(counts, previous)],
+                total - previous_total,
+            )
+
+    return delta
+
+
+def _counter_delta(
+    before: Mapping[str, float], after: Mapping[str, float]
+) -> dict[str, float]:
+    return {
+        label_value: value - before.get(label_value, 0)
+        for label_value, value in after.items()
+        if value != before.get(label_value, 0)
+    }
+
+
+def call_recording_stages(
+    fn: Callable[P, R], *args: P.args, **kwargs: P.kwargs
+) -> tuple[R, StageRecord]:
+    """Call `fn` and return its result with the stage timings it recorded.
+
+    Process pool workers run their tasks through this: a worker's registry
+    is never scraped, so the parent adds the timings to its own with
+    `merge_stages`. A worker runs one task at a time, so everything recorded
+    during the call belongs to it. The timings of a call that raises are lost.
+    """
+    seconds, errors = STAGE_SECONDS.snapshot(), STAGE_ERRORS.snapshot()
+    result = fn(*args, **kwargs)
+
+    return result, (
+        _histogram_delta(seconds, STAGE_SECONDS.snapshot()),
+        _counter_delta(errors, STAGE_ERRORS.snapshot()),
+    )
+
+
+def merge_stages(record: StageRecord) -> None:
+    """Add stage timings returned by `call_recording_stages` to this process."""
+    seconds, errors = record
+    STAGE_SECONDS.merge(seconds)
+    STAGE_ERRORS.merge(errors)
+
+
+def timed_stage(stage: str) -> Callable[[Callable[P, R]], Callable[P, R]]:
+    """Decorate a function so every call is timed as `stage`."""
+    return _timed(stage_timer, stage)
+
+
+def timed_tool(tool: str) -> Callable[[Callable[P, R]], Callable[P, R]]:
+    """Decorate an MCP tool handler so every call is timed as `tool`."""
+    return _timed(tool_timer, tool)
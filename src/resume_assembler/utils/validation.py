@@ -0,0 +1,456 @@
+from collections.abc import Callable, Iterable, Mapping
+from re import compile as compile_pattern
+from typing import Any, NamedTuple
+
+from utils.payload import Payload
+
+Path = tuple[str | int, ...]
+Checker = Callable[[Any, Path, list["ValidationIssue"]], None]
+# Returns the checker for a child of the given value, or `None` if unchecked.
+ChildChecker = Callable[[Any, str | int], Checker | None]
+
+_MISSING = object()
+
+# Word's limits: font sizes in points, margins in inches.
+MAX_FONT_SIZE = 1638
+MAX_MARGIN = 22
+
+# Characters outside the XML 1.0 character range, which lxml refuses to write.
+_XML_INVALID = compile_pattern(
+    r"[^\t\n\r\x20-\ud7ff\ue000-\ufffd\U00010000-\U0010ffff]"
+)
+
+
+class ValidationIssue(NamedTuple):
+    path: str
+    message: str
+
+    def as_dict(self) -> dict[str, str]:
+        return {"path": self.path, "message": self.message}
+
+
+class PayloadValidationError(ValueError):
+    """Raised when a payload does not match the `Payload` shape."""
+
+    def __init__(self, issues: list[ValidationIssue]) -> None:
+        self.issues = issues
+        details = "; ".join(f"{issue.path}: {issue.message}" for issue in issues)
+        super().__init__(f"Invalid payload: {details}")
+
+
+def _format_path(path: Path) -> str:
+    formatted = "payload"
+
+    for part in path:
+        formatted += f"[{part}]" if isinstance(part, int) else f".{part}"
+
+    return formatted
+
+
+def _fail(path: Path, errors: list[ValidationIssue], message: str) -> None:
+    errors.append(ValidationIssue(_format_path(path), message))
+
+
+def _type_name(value: Any) -> str:
+    if value is None:
+        return "null"
+
+    if isinstance(value, bool):
+        return "boolean"
+
+    if isinstance(value, (int, float)):
+        return "number"
+
+    if isinstance(value, str):
+        return "string"
+
+    if isinstance(value, (list, tuple)):
+        return "array"
+
+    if isinstance(value, Mapping):
+        return "object"
+
+    return type(value).__name__
+
+
+def _composite(check: Checker, shallow: Checker, child: ChildChecker) -> Checker:
+    """Attach the structure of a container checker to it.
+
+    `shallow` checks the container itself without descending into its
+    children, and `child` returns the checker for one child. Together they
+    let `subtree_issues` validate one location without the whole payload.
+    """
+    check.shallow = shallow
+    check.child = child
+
+    return check
+
+
+def _shallow(checker: Checker) -> Checker:
+    return getattr(checker, "shallow", checker)
+
+
+def _child(checker: Checker, value: Any, key: str | int) -> Checker | None:
+    if (child := getattr(checker, "child", None)) is None:
+        return None
+
+    return child(value, key)
+
+
+def _scalar(name: str, accepts: Callable[[Any], bool]) -> Checker:
+    def check(value: Any, path: Path, errors: list[ValidationIssue]) -> None:
+        if not accepts(value):
+            _fail(path, errors, f"expected {name}, got {_type_name(value)}")
+
+    return check
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _xml_string(value: Any, path: Path, errors: list[ValidationIssue]) -> None:
+    if not isinstance(value, str):
+        _fail(path, errors, f"expected string, got {_type_name(value)}")
+        return
+
+    if (match := _XML_INVALID.search(value)) is not None:
+        _fail(
+            path,
+            errors,
+            f"contains U+{ord(match.group()):04X}, which a document cannot hold",
+        )
+
+
+def _bounded(
+    minimum: float,
+    maximum: float,
+    exclusive_minimum: bool = False,
+) -> Checker:
+    """Build a checker for a finite number within `minimum` and `maximum`."""
+    lower = "greater than" if exclusive_minimum else "at least"
+
+    def check(value: Any, path: Path, errors: list[ValidationIssue]) -> None:
+        if not _is_number(value):
+            _fail(path, errors, f"expected number, got {_type_name(value)}")
+            return
+
+        too_small = value <= minimum if exclusive_minimum else value < minimum
+
+        if too_small or not value <= maximum:
+            _fail(path, errors, f"must be {lower} {minimum} and at most {maximum}")
+
+    return check
+
+
+_string = _xml_string
+_boolean = _scalar("boolean", lambda v: isinstance(v, bool))
+_font_size = _bounded(0, MAX_FONT_SIZE, exclusive_minimum=True)
+_margin = _bounded(0, MAX_MARGIN)
+
+
+def _nullable(checker: Checker) -> Checker:
+    def check(value: Any, path: Path, errors: list[ValidationIssue]) -> None:
+        if value is not None:
+            checker(value, path, errors)
+
+    def shallow(value: Any, path: Path, errors: list[ValidationIssue]) -> None:
+        if value is not None:
+            _shallow(checker)(value, path, errors)
+
+    def child(value: Any, key: str | int) -> Checker | None:
+        return None if value is None else _child(checker, value, key)
+
+    return _composite(check, shallow, child)
+
+
+def _array(items: Checker, max_length: int | None = None) -> Checker:
+    def shallow(value: Any, path: Path, errors: list[ValidationIssue]) -> bool:
+        if not isinstance(value, (list, tuple)):
+            _fail(path, errors, f"expected array, got {_type_name(value)}")
+            return False
+
+        if max_length is not None and len(value) > max_length:
+            _fail(path, errors, f"expected at most {max_length} items")
+            return False
+
+        return True
+
+    def check(value: Any, path: Path, errors: list[ValidationIssue]) -> None:
+        if not shallow(value, path, errors):
+            return
+
+        for i, item in enumerate(value):
+            items(item, (*path, i), errors)
+
+    def child(value: Any, key: str | int) -> Checker | None:
+        return items if isinstance(key, int) else None
+
+    return _composite(check, shallow, child)
+
+
+def _object(
+    fields: Mapping[str, Checker],
+    required: tuple[str, ...] = (),
+    one_of_required: tuple[str, ...] = (),
+) -> Checker:
+    """Build a checker for a mapping with known fields.
+
+    Unknown fields are ignored. `one_of_required` lists alternative field
+    names of which at least one must be present and non-empty.
+    """
+    field_items = tuple(fields.items())
+
+    def shallow(value: Any, path: Path, errors: list[ValidationIssue]) -> bool:
+        if not isinstance(value, Mapping):
+            _fail(path, errors, f"expected object, got {_type_name(value)}")
+            return False
+
+        for name in required:
+            if name not in value:
+                _fail((*path, name), errors, "is required")
+
+        if one_of_required and not any(value.get(name) for name in one_of_required):
+            _fail(
+                (*path, one_of_required[0]),
+                errors,
+                f"one of {', '.join(one_of_required)} is required",
+            )
+
+        return True
+
+    def check(value: Any, path: Path, errors: list[ValidationIssue]) -> None:
+        if not shallow(value, path, errors):
+            return
+
+        for name, checker in field_items:
+            if name in value:
+                checker(value[name], (*path, name), errors)
+
+    def child(value: Any, key: str | int) -> Checker | None:
+        return fields.get(key) if isinstance(key, str) else None
+
+    return _composite(check, shallow, child)
+
+
+def _any_of(*checkers: tuple[Callable[[Any], bool], Checker]) -> Checker:
+    """Dispatch to the first checker whose guard accepts the value."""
+
+    def dispatch(value: Any) -> Checker | None:
+        for guard, checker in checkers:
+            if guard(value):
+                return checker
+
+        return None
+
+    def check(value: Any, path: Path, errors: list[ValidationIssue]) -> None:
+        if (checker := dispatch(value)) is None:
+            _fail(path, errors, f"unexpected {_type_name(value)}")
+            return
+
+        checker(value, path, errors)
+
+    def shallow(value: Any, path: Path, errors: list[ValidationIssue]) -> None:
+        if (checker := dispatch(value)) is None:
+            _fail(path, errors, f"unexpected {_type_name(value)}")
+            return
+
+        _shallow(checker)(value, path, errors)
+
+    def child(value: Any, key: str | int) -> Checker | None:
+        checker = dispatch(value)
+        return None if checker is None else _child(checker, value, key)
+
+    return _composite(check, shallow, child)
+
+
+_TEXT_STYLE = _object(
+    {
+        "font_name": _string,
+        "font_size": _font_size,
+        "bold": _boolean,
+        "italic": _boolean,
+        "underline": _boolean,
+        "center": _boolean,
+    }
+)
+
+_MARGINS = _any_of(
+    (
+        lambda v: isinstance(v, Mapping),
+        _object(
+            {
+                "top": _nullable(_margin),
+                "bottom": _nullable(_margin),
+                "left": _nullable(_margin),
+                "right": _nullable(_margin),
+            }
+        ),
+    ),
+    (lambda v: isinstance(v, (list, tuple)), _array(_nullable(_margin), max_length=4)),
+)
+
+_ITEM_DATE_STYLE = _object(
+    {
+        "tab_right": _boolean,
+        "parentheses_wrap": _boolean,
+        "date_format": _string,
+        "delimiter": _string,
+    }
+)
+
+_FORMATTING = _object(
+    {
+        "normal_text_style": _TEXT_STYLE,
+        "title_text_style": _TEXT_STYLE,
+        "subtitle_text_style": _TEXT_STYLE,
+        "summary_text_style": _TEXT_STYLE,
+        "sections_text_style": _TEXT_STYLE,
+        "section_header_style": _TEXT_STYLE,
+        "item_header_style": _TEXT_STYLE,
+        "margins": _nullable(_MARGINS),
+        "item_date_style": _ITEM_DATE_STYLE,
+    }
+)
+
+_CONTACT = _any_of(
+    (lambda v: isinstance(v, str), _string),
+    (
+        lambda v: isinstance(v, Mapping),
+        _object(
+            {
+                "type": _nullable(_string),
+                "display_type": _boolean,
+                "value": _nullable(_string),
+            }
+        ),
+    ),
+)
+
+_ITEM = _object(
+    {
+        "title": _string,
+        "heading": _string,
+        "org": _nullable(_string),
+        "location": _nullable(_string),
+        "start_date": _nullable(_string),
+        "end_date": _nullable(_string),
+        "content": _nullable(_string),
+        "bullets": _nullable(_array(_string)),
+    },
+    one_of_required=("title", "heading"),
+)
+
+_SECTION = _object(
+    {
+        "heading": _string,
+        "items": _array(_ITEM),
+    },
+    required=("heading", "items"),
+)
+
+_CONTENT = _object(
+    {
+        "name": _string,
+        "contacts": _array(_CONTACT),
+        "summary": _string,
+        "sections": _array(_SECTION),
+    }
+)
+
+_PAYLOAD = _object(
+    {
+        "version": _string,
+        "formatting": _FORMATTING,
+        "content": _CONTENT,
+    },
+    required=("content",),
+)
+
+
+def payload_issues(payload: Any) -> list[ValidationIssue]:
+    """Return every way in which `payload` does not match the `Payload` shape."""
+    errors: list[ValidationIssue] = []
+    _PAYLOAD(payload, (), errors)
+
+    return errors
+
+
+def validate_payload(payload: Any) -> Payload:
+    """Check a payload's shape before any storage or rendering work.
+
+    Raises:
+        PayloadValidationError: If the payload is malformed.
+    """
+    if issues := payload_issues(payload):
+        raise PayloadValidationError(issues)
+
+    return payload
+
+
+def _lookup(value: Any, key: str | int) -> Any:
+    if isinstance(key, int):
+        if isinstance(value, (list, tuple)) and 0 <= key < len(value):
+            return value[key]
+
+    elif isinstance(value, Mapping):
+        return value.get(key, _MISSING)
+
+    return _MISSING
+
+
+def subtree_issues(payload: Any, paths: Iterable[Path]) -> list[ValidationIssue]:
+    """Validate only the locations of `payload` that an edit touched.
+
+    Each touched value is checked in full, and its container is checked
+    without descending into its other children, which catches removed
+    required fields. A path whose container no longer exists is skipped,
+    since the edit that removed the container recorded a path of its own.
+
+    Args:
+        payload (Any): The edited payload.
+        paths (Iterable[Path]): The paths of values that were added,
+            replaced or removed.
+    Returns:
+        list[ValidationIssue]: The issues found in the touched locations.
+    """
+    errors: list[ValidationIssue] = []
+    checked: list[Path] = []
+    containers: set[Path] = set()
+
+    for path in sorted(set(paths), key=len):
+        if any(path[: len(done)] == done for done in checked):
+            continue
+
+        checked.append(path)
+
+        if not path:
+            _PAYLOAD(payload, (), errors)
+            continue
+
+        checker: Checker | None = _PAYLOAD
+        container = payload
+
+        for key in path[:-1]:
+            checker = _child(checker, container, key)
+            container = _lookup(container, key)
+
+            if checker is None or container is _MISSING:
+                break
+
+        else:
+            parent = path[:-1]
+
+            if parent not in containers:
+                containers.add(parent)
+                _shallow(checker)(container, parent, errors)
+
+            value = _lookup(container, path[-1])
+
+            if (
+                value is not _MISSING
+                and (child := _child(checker, container, path[-1])) is not None
+            ):
+                child(value, path, errors)
+
+    return errors
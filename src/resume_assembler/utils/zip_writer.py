@@ -0,0 +1,200 @@
+from io import BytesIO
+from struct import Struct
+from typing import NamedTuple
+from zlib import DEFLATED, MAX_WBITS, compressobj, crc32
+
+from utils.lazy import lazy_import
+
+# Only needed to read archives; keeps the render service import light.
+zipfile = lazy_import("zipfile")
+
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+
+# Compression level 0 stores entries uncompressed; 1-9 are deflate levels.
+STORE_ONLY = 0
+DEFAULT_COMPRESSION_LEVEL = 6
+
+# Every entry gets the same DOS timestamp (1980-01-01 00:00), so equal
+# content always serializes to equal bytes.
+_DOS_TIME = 0
+_DOS_DATE = (1 << 5) | 1
+_UTF8_FLAG = 0x800
+_VERSION = 20
+
+_LOCAL_HEADER = Struct("<4s5H3L2H")
+_CENTRAL_HEADER = Struct("<4s6H3L5H2L")
+_END_OF_CENTRAL_DIRECTORY = Struct("<4s4H2LH")
+
+
+class ZipEntry(NamedTuple):
+    """One archive member, with its data as stored in the archive."""
+
+    name: str
+    method: int
+    crc: int
+    size: int
+    data: bytes
+
+    def matches(self, blob: bytes, method: int) -> bool:
+        """Return whether this entry holds `blob` stored with `method`."""
+        return (
+            self.method == method and self.size == len(blob) and self.crc == crc32(blob)
+        )
+
+
+def compression_method(level: int) -> int:
+    if not STORE_ONLY <= level <= 9:
+        raise ValueError(f"Compression level must be between 0 and 9: {level}")
+
+    return ZIP_STORED if level == STORE_ONLY else ZIP_DEFLATED
+
+
+def compress_entry(name: str, blob: bytes, level: int) -> ZipEntry:
+    """Return an archive entry for `blob` compressed at `level`."""
+    if compression_method(level) == ZIP_STORED:
+        return ZipEntry(name, ZIP_STORED, crc32(blob), len(blob), blob)
+
+    compressor = compressobj(level, DEFLATED, -MAX_WBITS)
+    data = compressor.compress(blob) + compressor.flush()
+
+    return ZipEntry(name, ZIP_DEFLATED, crc32(blob), len(blob), data)
+
+
+def read_entries(archive: bytes) -> dict[str, ZipEntry]:
+    """Return the members of a zip archive without decompressing them.
+
+    Args:
+        archive (bytes): The serialized archive.
+    Returns:
+        dict[str, ZipEntry]: The entries keyed by member name, in archive order.
+    Raises:
+        ValueError: If `archive` is not a readable zip archive.
+    """
+    try:
+        with zipfile.ZipFile(BytesIO(archive)) as zf:
+            infos = zf.infolist()
+
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Invalid zip archive: {e}") from e
+
+    entries: dict[str, ZipEntry] = {}
+    view = memoryview(archive)
+
+    for info in infos:
+        header = _LOCAL_HEADER.unpack_from(archive, info.header_offset)
+        start = info.header_offset + _LOCAL_HEADER.size + header[9] + header[10]
+        data = bytes(view[start : start + info.compress_size])
+        entries[info.filename] = ZipEntry(
+            info.filename, info.compress_type, info.CRC, info.file_size, data
+        )
+
+    return entries
+
+
+def write_zip(entries: list[ZipEntry]) -> bytes:
+    """Serialize entries into a zip archive, copying their data as is."""
+    buffer = BytesIO()
+    central = BytesIO()
+
+    for entry in entries:
+        name = entry.name.encode("utf-8")
+        flags = 0 if entry.name.isascii() else _UTF8_FLAG
+        offset = buffer.tell()
+
+        buffer.write(
+            _LOCAL_HEADER.pack(
+                b"PK\x03\x04",
+                _VERSION,
+                flags,
+                entry.method,
+                _DOS_TIME,
+                _DOS_DATE,
+                entry.crc,
+                len(entry.data),
+                entry.size,
+                len(name),
+                0,
+            )
+        )
+        buffer.write(name)
+        buffer.write(entry.data)
+
+        central.write(
+            _CENTRAL_HEADER.pack(
+                b"PK\x01\x02",
+                _VERSION,
+                _VERSION,
+                flags,
+                entry.method,
+                _DOS_TIME,
+                _DOS_DATE,
+                entry.crc,
+                len(entry.data),
+                entry.size,
+                len(name),
+                0,
+                0,
+                0,
+                0,
+                0,
+                offset,
+            )
+        )
+        central.write(name)
+
+    directory = central.getvalue()
+    directory_offset = buffer.tell()
+    buffer.write(directory)
+    buffer.write(
+        _END_OF_CENTRAL_DIRECTORY.pack(
+            b"PK\x05\x06",
+            0,
+            0,
+            len(entries),
+            len(entries),
+            len(directory),
+            directory_offset,
+            0,
+        )
+    )
+
+    return buffer.getvalue()
+
+
+class ZipWriter:
+    """Zip archive writer that reuses compressed members of a source archive.
+
+    A member whose bytes are identical to the same member of `source`, and
+    that would be stored with the same method, is copied from the source as
+    already compressed data. Only new or modified members are compressed.
+
+    Args:
+        source (bytes | None): The archive the new one was derived from.
+        compression_level (int): `STORE_ONLY` to store members uncompressed,
+            or a deflate level from 1 to 9.
+    """
+
+    def __init__(
+        self,
+        source: bytes | None = None,
+        compression_level: int = DEFAULT_COMPRESSION_LEVEL,
+    ) -> None:
+        self.compression_level = compression_level
+        self._method = compression_method(compression_level)
+        self._source = read_entries(source) if source is not None else {}
+        self._entries: list[ZipEntry] = []
+        self.reused = 0
+
+    def write(self, name: str, blob: bytes) -> None:
+        previous = self._source.get(name)
+
+        if previous is not None and previous.matches(blob, self._method):
+            self._entries.append(previous)
+            self.reused += 1
+            return
+
+        self._entries.append(compress_entry(name, blob, self.compression_level))
+
+    def getvalue(self) -> bytes:
+        return write_zip(self._entries)